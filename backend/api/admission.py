@@ -0,0 +1,211 @@
+"""
+Admission control for the /ask pipeline.
+
+At most ASK_MAX_CONCURRENT questions run at once; up to ASK_MAX_QUEUE more
+wait for a slot, each for at most ASK_MAX_QUEUE_WAIT_MS. Anything beyond
+that is rejected immediately with 503 and a Retry-After estimated from
+recent service times, so a burst degrades into fast rejections instead
+of every request timing out.
+
+Waiting happens on the event loop, so queued requests do not hold threads
+of the threadpool that ingest, replace, reindex and the admitted requests
+themselves run in.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict
+from fastapi import HTTPException
+import sys
+sys.path.append('..')
+from config import ASK_MAX_CONCURRENT, ASK_MAX_QUEUE, ASK_MAX_QUEUE_WAIT_MS
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted."""
+    
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency limiter with a bounded, time-limited wait queue.
+    
+    acquire and release must be called from the event loop of the worker
+    process; get_stats may be called from any thread.
+    """
+    
+    def __init__(
+        self,
+        max_concurrent: int = ASK_MAX_CONCURRENT,
+        max_queue: int = ASK_MAX_QUEUE,
+        max_wait_ms: float = ASK_MAX_QUEUE_WAIT_MS
+    ):
+        """
+        Initialize controller.
+        
+        Args:
+            max_concurrent: Requests allowed to run at once
+            max_queue: Requests allowed to wait for a slot
+            max_wait_ms: Longest a request waits before it is rejected
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait_ms / 1000.0
+        self._cond = asyncio.Condition()
+        self._running = 0
+        self._waiting = 0
+        self._next_ticket = 0
+        self._serving_ticket = 0
+        self._abandoned = set()  # tickets of waiters that timed out before their turn
+        self._wait_times = deque(maxlen=1000)
+        self._service_times = deque(maxlen=200)
+        self.stats = {'admitted': 0, 'rejected_queue_full': 0, 'rejected_timeout': 0, 'max_queue_depth': 0}
+    
+    def _retry_after(self) -> int:
+        """Seconds until a slot is likely free, from recent service times (caller holds the lock)."""
+        mean_service = sum(self._service_times) / len(self._service_times) if self._service_times else 1.0
+        return max(1, math.ceil(mean_service * (self._waiting + 1) / self.max_concurrent))
+    
+    def _advance(self):
+        """Pass the head of the line to the next live ticket (caller holds the lock)."""
+        self._serving_ticket += 1
+        while self._serving_ticket in self._abandoned:
+            self._abandoned.discard(self._serving_ticket)
+            self._serving_ticket += 1
+    
+    async def acquire(self) -> float:
+        """
+        Take a slot, waiting in arrival order if none is free.
+        
+        Returns:
+            Seconds spent waiting
+        
+        Raises:
+            AdmissionRejected: If the queue is full or the wait times out
+        """
+        arrived = time.monotonic()
+        async with self._cond:
+            if self._running >= self.max_concurrent or self._waiting:
+                if self._waiting >= self.max_queue:
+                    self.stats['rejected_queue_full'] += 1
+                    raise AdmissionRejected("queue_full", self._retry_after())
+                
+                ticket = self._next_ticket
+                self._next_ticket += 1
+                self._waiting += 1
+                self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], self._waiting)
+                try:
+                    # On timeout the condition's lock is re-acquired before the error surfaces
+                    await asyncio.wait_for(
+                        self._cond.wait_for(
+                            lambda: self._serving_ticket == ticket and self._running < self.max_concurrent
+                        ),
+                        timeout=self.max_wait
+                    )
+                    admitted = True
+                except asyncio.TimeoutError:
+                    admitted = False
+                finally:
+                    self._waiting -= 1
+                    if self._serving_ticket == ticket:
+                        self._advance()
+                    else:
+                        self._abandoned.add(ticket)
+                    self._cond.notify_all()
+                if not admitted:
+                    self.stats['rejected_timeout'] += 1
+                    raise AdmissionRejected("queue_timeout", self._retry_after())
+            
+            self._running += 1
+            self.stats['admitted'] += 1
+            waited = time.monotonic() - arrived
+            self._wait_times.append(waited)
+        return waited
+    
+    async def release(self, service_seconds: float):
+        """
+        Free a slot taken with acquire.
+        
+        Args:
+            service_seconds: How long the slot was held, used for Retry-After estimates
+        """
+        async with self._cond:
+            self._running -= 1
+            self._service_times.append(service_seconds)
+            self._cond.notify_all()
+    
+    @asynccontextmanager
+    async def admit(self):
+        """Hold a slot for the duration of the block (see acquire)."""
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            await self.release(time.monotonic() - started)
+    
+    def get_stats(self) -> Dict:
+        """Queue depth, wait times and rejection counters."""
+        # Read without the loop-bound lock: counters are plain ints and
+        # copying a deque is atomic under the GIL
+        waits = sorted(self._wait_times)
+        service_times = list(self._service_times)
+        return {
+            **self.stats,
+            'running': self._running,
+            'queued': self._waiting,
+            'max_concurrent': self.max_concurrent,
+            'max_queue': self.max_queue,
+            'mean_wait_ms': round(1000 * sum(waits) / len(waits), 1) if waits else 0.0,
+            'p95_wait_ms': round(1000 * waits[int(0.95 * (len(waits) - 1))], 1) if waits else 0.0,
+            'mean_service_seconds': round(sum(service_times) / len(service_times), 3) if service_times else 0.0
+        }
+
+
+_ask_admission = None
+_ask_admission_lock = threading.Lock()
+
+
+def get_ask_admission() -> AdmissionController:
+    """Get or create the global /ask admission controller."""
+    global _ask_admission
+    if _ask_admission is None:
+        with _ask_admission_lock:
+            if _ask_admission is None:
+                _ask_admission = AdmissionController()
+    return _ask_admission
+
+
+async def admit_ask():
+    """
+    FastAPI dependency holding an /ask slot for the duration of the request.
+    
+    Async so the queue wait happens on the event loop: a queued request holds
+    no threadpool thread until it is admitted and its endpoint runs.
+    
+    Yields:
+        Monotonic time the request arrived, so queueing counts against its latency budget
+    """
+    controller = get_ask_admission()
+    arrived = time.monotonic()
+    try:
+        await controller.acquire()
+    except AdmissionRejected as e:
+        print(f"/ask rejected ({e.reason}), retry after {e.retry_after}s")
+        raise HTTPException(
+            status_code=503,
+            detail="The server is busy answering other questions. Please try again shortly.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    started = time.monotonic()
+    try:
+        yield arrived
+    finally:
+        await controller.release(time.monotonic() - started)
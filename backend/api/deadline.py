@@ -0,0 +1,74 @@
+"""
+Per-request latency budgets for the /ask pipeline.
+
+Each request gets a Deadline when it arrives. Mandatory stages (query
+embedding, search, generation) always run; optional or expensive stages
+check the remaining budget first and are skipped or downgraded when it
+cannot cover them, and every such decision is recorded so the response
+can report it.
+"""
+import time
+from typing import List, Optional, Tuple
+import sys
+sys.path.append('..')
+from config import (
+    ASK_LATENCY_BUDGET_MS, LLM_MAX_TOKENS, LLM_MIN_MAX_TOKENS, LLM_MIN_TIMEOUT_MS,
+    LLM_TIMEOUT_SECONDS, LLM_TOKENS_PER_SECOND
+)
+
+
+class Deadline:
+    """Remaining latency budget of one request and the degradations applied to it."""
+    
+    def __init__(self, budget_ms: Optional[float] = None, started: Optional[float] = None):
+        """
+        Start the clock.
+        
+        Args:
+            budget_ms: Latency budget in milliseconds (defaults to ASK_LATENCY_BUDGET_MS)
+            started: Monotonic time the request arrived (defaults to now)
+        """
+        self.budget_ms = budget_ms or ASK_LATENCY_BUDGET_MS
+        self.started = started if started is not None else time.monotonic()
+        self.degradations: List[str] = []
+    
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the request started."""
+        return (time.monotonic() - self.started) * 1000
+    
+    def remaining_ms(self) -> float:
+        """Milliseconds left in the budget (negative once it is exceeded)."""
+        return self.budget_ms - self.elapsed_ms()
+    
+    def allows(self, stage_ms: float, reserve_ms: float = 0.0) -> bool:
+        """Whether a stage expected to take stage_ms fits, keeping reserve_ms for later stages."""
+        return self.remaining_ms() - reserve_ms >= stage_ms
+    
+    def degrade(self, name: str):
+        """Record a degradation applied to this request."""
+        self.degradations.append(name)
+        print(f"Latency budget: {name} ({self.remaining_ms():.0f} ms of {self.budget_ms:.0f} ms left)")
+    
+    def llm_limits(self, reserve_ms: float = 0.0) -> Tuple[float, int]:
+        """
+        Timeout and max_tokens for the generation call.
+        
+        The LLM gets whatever budget is left after reserve_ms (never less than
+        LLM_MIN_TIMEOUT_MS), and max_tokens shrinks to what it can produce in
+        that time at LLM_TOKENS_PER_SECOND.
+        
+        Args:
+            reserve_ms: Budget kept for the stages after generation
+        
+        Returns:
+            Tuple of (timeout in seconds, max_tokens)
+        """
+        available_ms = self.remaining_ms() - reserve_ms
+        timeout_ms = min(max(available_ms, LLM_MIN_TIMEOUT_MS), LLM_TIMEOUT_SECONDS * 1000)
+        if available_ms < LLM_MIN_TIMEOUT_MS:
+            self.degrade("budget_exhausted")
+        
+        max_tokens = max(LLM_MIN_MAX_TOKENS, int(timeout_ms / 1000 * LLM_TOKENS_PER_SECOND))
+        if max_tokens < LLM_MAX_TOKENS:
+            self.degrade(f"max_tokens_reduced:{max_tokens}")
+        return timeout_ms / 1000, min(max_tokens, LLM_MAX_TOKENS)
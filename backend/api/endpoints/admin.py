@@ -2,69 +2,286 @@
 /admin endpoints - Administrative functions.
 """
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+import numpy as np
 import sys
 sys.path.append('../..')
 from db import get_db, crud, schema
-from retrieval import get_embedder, get_vector_store
-from ingestion import TextChunker
+from retrieval import get_embedder, get_vector_store, get_reranker, VectorStore, swap_vector_store, index_write_lock
+from retrieval.embedding_pool import EmbeddingPool, use_embedding_pool
+from retrieval.inference import get_inference_stats
+from retrieval.scheduler import get_model_scheduler
+from api.admission import get_ask_admission
+from llm import get_llm_rate_limiter, get_latency_tracker
+from verification.sentence_index import build_sentence_rows
+from config import REINDEX_BATCH_SIZE, SENTENCE_INDEX_ENABLED, RERANK_ENABLED
 
 router = APIRouter()
 
 
+def _embed_chunks_into(store: VectorStore, chunks: List[Tuple[str, str]]):
+    """Embed (chunk_id, text) pairs in batches and add them to a store."""
+    if use_embedding_pool(len(chunks)):
+        # Large jobs are sharded across worker processes; windows stream back in order
+        offset = 0
+        with EmbeddingPool() as pool:
+            for embeddings in pool.iter_embeddings([text for _, text in chunks]):
+                store.add_embeddings(embeddings, [chunk_id for chunk_id, _ in chunks[offset:offset + len(embeddings)]])
+                offset += len(embeddings)
+        return
+    
+    embedder = get_embedder()
+    for start in range(0, len(chunks), REINDEX_BATCH_SIZE):
+        batch = chunks[start:start + REINDEX_BATCH_SIZE]
+        embeddings = embedder.embed_batch([text for _, text in batch])
+        store.add_embeddings(embeddings, [chunk_id for chunk_id, _ in batch])
+
+
+def _store_sentence_embeddings(db: Session, chunks: List[Tuple[str, str]]):
+    """Embed the sentences of (chunk_id, text) pairs in batches and store them."""
+    embedder = get_embedder()
+    for start in range(0, len(chunks), REINDEX_BATCH_SIZE):
+        batch = chunks[start:start + REINDEX_BATCH_SIZE]
+        crud.replace_chunk_sentences(db, build_sentence_rows(embedder, batch))
+
+
+def _build_shadow_index(db: Session, reuse_vectors: bool) -> VectorStore:
+    """
+    Build a new vector store from all chunks in the database.
+    
+    The live store is only read, never modified, so queries keep using it
+    while the shadow index is built.
+    
+    Args:
+        db: Database session
+        reuse_vectors: Copy vectors of chunks already in the live index
+            instead of re-embedding them
+    """
+    all_chunks = db.query(crud.models.Chunk.chunk_id, crud.models.Chunk.text).all()
+    shadow = VectorStore()
+    
+    to_embed = list(all_chunks)
+    if reuse_vectors and all_chunks:
+        # One locked read: concurrent ingests and removals cannot pair vectors with the wrong IDs
+        found_ids, vectors = get_vector_store().get_vectors([chunk_id for chunk_id, _ in all_chunks])
+        if found_ids:
+            shadow.add_embeddings(vectors, found_ids)
+        found = set(found_ids)
+        to_embed = [(chunk_id, text) for chunk_id, text in all_chunks if chunk_id not in found]
+        print(f"Reusing {len(found_ids)} stored vectors")
+    
+    if to_embed:
+        print(f"Generating embeddings for {len(to_embed)} chunks...")
+        _embed_chunks_into(shadow, to_embed)
+    
+    if SENTENCE_INDEX_ENABLED:
+        # Sentence embeddings follow the chunk vectors: re-embedded chunks get
+        # fresh ones, and chunks ingested before the sentence index get theirs
+        re_embedded = {chunk_id for chunk_id, _ in to_embed}
+        with_sentences = set(crud.get_chunk_ids_with_sentences(db))
+        stale = [
+            (chunk_id, text) for chunk_id, text in all_chunks
+            if chunk_id in re_embedded or chunk_id not in with_sentences
+        ]
+        if stale:
+            print(f"Generating sentence embeddings for {len(stale)} chunks...")
+            _store_sentence_embeddings(db, stale)
+    
+    return shadow
+
+
+def _catch_up_and_swap(db: Session, shadow: VectorStore):
+    """
+    Bring a finished shadow index in line with the database and make it live.
+    
+    Runs under the index write lock: chunks ingested while the shadow was
+    built are embedded into it, and chunks deleted meanwhile (by a replace or
+    delete) are removed, before it is saved and swapped in.
+    """
+    with index_write_lock():
+        indexed = set(shadow.chunk_ids)
+        db_chunks = db.query(crud.models.Chunk.chunk_id, crud.models.Chunk.text).all()
+        db_ids = {chunk_id for chunk_id, _ in db_chunks}
+        
+        missed = [(chunk_id, text) for chunk_id, text in db_chunks if chunk_id not in indexed]
+        if missed:
+            print(f"Catching up on {len(missed)} chunks added during reindex...")
+            _embed_chunks_into(shadow, missed)
+        
+        deleted = list(indexed - db_ids)
+        if deleted:
+            print(f"Dropping {len(deleted)} chunks deleted during reindex...")
+            shadow.remove_chunk_ids(deleted)
+        
+        shadow.save(db_high_water_mark=crud.get_chunk_high_water_mark(db))
+        swap_vector_store(shadow)
+
+
 @router.post("/admin/reindex", response_model=schema.ReindexResponse)
-async def reindex(db: Session = Depends(get_db)):
+async def reindex(db: Session = Depends(get_db), reuse_vectors: bool = False):
     """
     Rebuild the vector index from all chunks in the database.
     
+    A shadow index is built in a worker thread while queries keep using the
+    live index; it is then saved with atomic file renames and swapped in as
+    the active index in a single reference exchange.
+    
     Note: This is useful for manual index repairs or corruption recovery.
     
     Args:
         db: Database session
+        reuse_vectors: Reuse vectors from the live index where available
+            (only chunks missing from it are embedded)
         
     Returns:
         Reindex response with statistics
     """
     try:
-        all_chunks = db.query(crud.models.Chunk).all()
+        shadow = await run_in_threadpool(_build_shadow_index, db, reuse_vectors)
+        # Catch-up embeds and saves under the lock, so it also stays off the event loop
+        await run_in_threadpool(_catch_up_and_swap, db, shadow)
         
-        if not all_chunks:
-            # If no chunks in DB, clear the vector store
-            vector_store = get_vector_store()
-            vector_store.clear()
-            vector_store.save()
-            
+        chunk_count = shadow.get_size()
+        if chunk_count == 0:
             return schema.ReindexResponse(
                 message="Database is empty. Index cleared.",
                 chunks_indexed=0,
                 materials_processed=0
             )
         
+        materials = db.query(crud.models.Material).all()
+        
+        return schema.ReindexResponse(
+            message=f"Successfully reindexed {chunk_count} chunks from {len(materials)} materials",
+            chunks_indexed=chunk_count,
+            materials_processed=len(materials)
+        )
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reindexing: {str(e)}")
+
+
+def _check_index(db: Session, repair: bool) -> dict:
+    """
+    Compare the live index with the database under the index write lock and optionally repair it.
+    
+    Repairs are made to a copy of the live store, which is then saved and
+    swapped in, so searches never see the index half repaired.
+    
+    Returns:
+        Dict with index_size, db_chunks, orphans, missing, duplicates, consistent and repaired
+    """
+    with index_write_lock():
         vector_store = get_vector_store()
-        vector_store.clear()
+        index_ids = np.asarray(vector_store.chunk_ids, dtype=str)
+        db_ids = np.asarray([row[0] for row in db.query(crud.models.Chunk.chunk_id).all()], dtype=str)
         
-        embedder = get_embedder()
-        chunk_texts = [chunk.text for chunk in all_chunks]
-        chunk_ids = [chunk.chunk_id for chunk in all_chunks]
+        unique_ids, counts = np.unique(index_ids, return_counts=True)
+        duplicates = unique_ids[counts > 1].tolist()
+        orphans = np.setdiff1d(unique_ids, db_ids, assume_unique=True).tolist()
+        missing = np.setdiff1d(db_ids, unique_ids, assume_unique=True).tolist()
         
-        print(f"Generating embeddings for {len(all_chunks)} chunks...")
-        embeddings = embedder.embed_batch(chunk_texts)
+        consistent = not (orphans or missing or duplicates)
+        repaired = False
         
-        print(f"Adding to vector store...")
-        vector_store.add_embeddings(embeddings, chunk_ids)
+        if repair and not consistent:
+            repaired_store = vector_store.copy()
+            if duplicates:
+                # Keep one copy of each duplicated vector
+                kept_ids, kept_vectors = repaired_store.get_vectors(duplicates)
+                repaired_store.remove_chunk_ids(duplicates)
+                repaired_store.add_embeddings(kept_vectors, kept_ids)
+            
+            if orphans:
+                repaired_store.remove_chunk_ids(orphans)
+            
+            if missing:
+                print(f"Embedding {len(missing)} chunks missing from the index...")
+                missing_chunks = crud.get_chunk_texts(db, missing)
+                _embed_chunks_into(repaired_store, missing_chunks)
+                if SENTENCE_INDEX_ENABLED:
+                    # Repaired chunks need sentence rows too, or sentence-level verification misses them
+                    with_sentences = set(crud.get_chunk_ids_with_sentences(db))
+                    without_sentences = [(chunk_id, text) for chunk_id, text in missing_chunks if chunk_id not in with_sentences]
+                    if without_sentences:
+                        _store_sentence_embeddings(db, without_sentences)
+            
+            repaired_store.save(db_high_water_mark=crud.get_chunk_high_water_mark(db))
+            swap_vector_store(repaired_store)
+            repaired = True
+    
+    return {
+        'index_size': len(index_ids),
+        'db_chunks': len(db_ids),
+        'orphans': orphans,
+        'missing': missing,
+        'duplicates': duplicates,
+        'consistent': consistent,
+        'repaired': repaired
+    }
+
+
+@router.post("/admin/verify-index", response_model=schema.VerifyIndexResponse)
+async def verify_index(repair: bool = False, db: Session = Depends(get_db)):
+    """
+    Check the vector index against the database and optionally repair drift.
+    
+    Orphans (vectors without a chunk row), gaps (chunks without a vector)
+    and duplicate vectors are found with vectorized set operations. Repair
+    removes orphan and duplicate vectors and embeds only the missing chunks,
+    so its cost is proportional to the drift rather than the corpus.
+    
+    Args:
+        repair: Fix the drift instead of only reporting it
+        db: Database session
         
-        vector_store.save()
+    Returns:
+        Verification report
+    """
+    try:
+        # Embedding missing chunks can take long (or start the process pool), so keep it off the event loop
+        result = await run_in_threadpool(_check_index, db, repair)
+        orphans, missing, duplicates = result['orphans'], result['missing'], result['duplicates']
+        consistent, repaired = result['consistent'], result['repaired']
         
-        materials = db.query(crud.models.Material).all()
+        if consistent:
+            message = "Index and database are consistent."
+        elif repaired:
+            message = (
+                f"Repaired index: removed {len(orphans)} orphan vectors, "
+                f"deduplicated {len(duplicates)} chunks, embedded {len(missing)} missing chunks."
+            )
+        else:
+            message = (
+                f"Found {len(orphans)} orphan vectors, {len(missing)} missing chunks and "
+                f"{len(duplicates)} duplicated chunks. Call with repair=true to fix."
+            )
         
-        return schema.ReindexResponse(
-            message=f"Successfully reindexed {len(all_chunks)} chunks from {len(materials)} materials",
-            chunks_indexed=len(all_chunks),
-            materials_processed=len(materials)
+        return schema.VerifyIndexResponse(
+            index_size=result['index_size'],
+            db_chunks=result['db_chunks'],
+            orphan_count=len(orphans),
+            missing_count=len(missing),
+            duplicate_count=len(duplicates),
+            orphans=orphans[:50],
+            missing=missing[:50],
+            consistent=consistent,
+            repaired=repaired,
+            message=message
         )
     
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error reindexing: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error verifying index: {str(e)}")
+
+
+def _publish_empty_store():
+    """Save an empty index as the live snapshot and swap it in."""
+    with index_write_lock():
+        empty_store = VectorStore()
+        empty_store.save(db_high_water_mark=0)
+        swap_vector_store(empty_store)
 
 
 @router.post("/admin/reset")
@@ -77,16 +294,62 @@ async def reset_database(db: Session = Depends(get_db)):
         db.query(crud.models.ChatMessage).delete()
         db.query(crud.models.ChatSession).delete()
         db.query(crud.models.QueryLog).delete()
+        db.query(crud.models.ChunkSentences).delete()
         db.query(crud.models.Chunk).delete()
         db.query(crud.models.Material).delete()
         db.commit()
         
-        # Clear (empty) the vector store
-        vector_store = get_vector_store()
-        vector_store.clear()
-        vector_store.save()
+        # Swap in an empty vector store (the index lock must not block the event loop)
+        await run_in_threadpool(_publish_empty_store)
         
         return {"message": "System fully reset. All materials and history deleted."}
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error resetting system: {str(e)}")
+
+
+@router.get("/admin/metrics")
+def get_metrics():
+    """Admission, LLM rate limiting, batching, scheduling and reranking counters of this worker process."""
+    return {
+        "ask_admission": get_ask_admission().get_stats(),
+        "llm_rate_limiter": get_llm_rate_limiter().get_stats(),
+        "llm_latency": get_latency_tracker().get_stats(),
+        "inference_batching": get_inference_stats(),
+        "model_scheduler": get_model_scheduler().get_stats(),
+        "reranker": dict(get_reranker().stats) if RERANK_ENABLED else None
+    }
+
+
+@router.get("/admin/snapshots")
+async def list_snapshots():
+    """List retained index snapshots, newest first."""
+    return {"snapshots": get_vector_store().list_snapshots()}
+
+
+def _activate_snapshot(version: int) -> Optional[VectorStore]:
+    """Load a retained snapshot, make it live and swap it in; None if it is missing or invalid."""
+    with index_write_lock():
+        store = VectorStore()
+        if not store.activate_snapshot(version):
+            return None
+        swap_vector_store(store)
+    return store
+
+
+@router.post("/admin/snapshots/{version}/activate")
+async def activate_snapshot(version: int):
+    """
+    Roll the index back (or forward) to a retained snapshot.
+    
+    Args:
+        version: Snapshot version to make live
+    """
+    store = await run_in_threadpool(_activate_snapshot, version)
+    if store is None:
+        raise HTTPException(status_code=404, detail=f"Snapshot v{version} not found or failed validation")
+    
+    return {
+        "message": f"Index snapshot v{version} is now live",
+        "vector_count": store.get_size()
+    }
@@ -10,15 +10,21 @@ from db import get_db, crud, schema
 from retrieval import get_embedder, get_vector_store, MetadataFilter, get_reranker
 from llm import get_llm_client, SYSTEM_PROMPT, create_rag_prompt, extract_refusal_keywords
 from verification import get_faithfulness_checker, get_scorer
-from config import TOP_K, RERANK_ENABLED
+from verification.sentence_index import attach_sentence_vectors
+from api.deadline import Deadline
+from api.admission import admit_ask
+from config import TOP_K, RERANK_ENABLED, RERANK_STAGE_MS, VERIFICATION_STAGE_MS, LLM_MIN_TIMEOUT_MS
 
 router = APIRouter()
 
 
+# A plain def runs in the threadpool, so concurrent questions overlap and
+# their model calls can be micro-batched together
 @router.post("/ask", response_model=schema.QueryResponse)
-async def ask_question(
+def ask_question(
     request: schema.QueryRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    arrived: float = Depends(admit_ask)
 ):
     """
     Answer a question using RAG.
@@ -26,10 +32,14 @@ async def ask_question(
     Args:
         request: Query request with question and optional filters
         db: Database session
+        arrived: Arrival time; requests over the concurrency limit wait or get 503 before this runs
         
     Returns:
         Query response with answer, sources, and verification info
     """
+    # Optional stages check the remaining budget; degradations are reported in the response
+    deadline = Deadline(request.latency_budget_ms, started=arrived)
+    
     try:
         # Handle Chat Session: Validate and collect recent history
         chat_history = []
@@ -78,6 +88,7 @@ async def ask_question(
         
         # Helper to save assistant response and return
         def save_and_return(response: schema.QueryResponse):
+            response.degradations = deadline.degradations
             if request.session_id:
                 crud.create_chat_message(
                     db, 
@@ -85,7 +96,11 @@ async def ask_question(
                     "assistant", 
                     response.answer,
                     [s.dict() for s in response.sources],
-                    {"faithfulness": response.faithfulness_score, "status": response.verification_status}
+                    {
+                        "faithfulness": response.faithfulness_score,
+                        "status": response.verification_status,
+                        "degradations": response.degradations
+                    }
                 )
             return response
 
@@ -110,20 +125,19 @@ async def ask_question(
         
         # Limit to top_k after filtering
         # Rerank results if enabled
-        if RERANK_ENABLED and results and reranker:
-            print(f"Reranking {len(results)} chunks...")
-            # Fetch text for candidates to rerank
-            candidates = []
-            for chunk_id, score in results:
-                chunk = crud.get_chunk(db, chunk_id)
-                if chunk:
-                    candidates.append((chunk_id, chunk.text, float(score)))
-            
-            # Apply cross-encoder reranking
-            reranked_tuples = reranker.rerank(retrieval_query, candidates)
-            
-            # Update results with reranked scores
-            results = [(c_id, score) for c_id, _, score in reranked_tuples]
+        if RERANK_ENABLED and results and reranker and not deadline.allows(
+            RERANK_STAGE_MS, reserve_ms=LLM_MIN_TIMEOUT_MS + VERIFICATION_STAGE_MS
+        ):
+            deadline.degrade("rerank_skipped")
+        elif RERANK_ENABLED and results and reranker:
+            # Cascade: skipped when dense scores are decisive, otherwise only a
+            # prefix is scored and texts are fetched for uncached candidates only
+            results = reranker.rerank_results(
+                retrieval_query,
+                [(chunk_id, float(score)) for chunk_id, score in results],
+                top_k,
+                lambda chunk_ids: dict(crud.get_chunk_texts(db, chunk_ids))
+            )
 
         # Limit to top_k after filtering and reranking
         results = results[:top_k]
@@ -150,6 +164,7 @@ async def ask_question(
                 continue
             
             context_chunks.append({
+                'chunk_id': chunk.chunk_id,
                 'text': chunk.text,
                 'metadata': chunk.chunk_metadata
             })
@@ -168,13 +183,14 @@ async def ask_question(
         
         # Log if we found missing chunks
         if missing_chunks > 0:
-            print(f"Warning: Found {missing_chunks} chunks in FAISS but not in database. Index may be out of sync.")
+            print(f"Warning: Found {missing_chunks} chunks in FAISS but not in database. Index may be out of sync; run POST /admin/verify-index?repair=true.")
         
         # Create RAG prompt
         prompt = create_rag_prompt(request.question, context_chunks, history=chat_history)
         
-        # Generate answer
-        answer = llm_client.generate(prompt, system_prompt=SYSTEM_PROMPT)
+        # Generate answer within what is left of the budget, keeping time for verification
+        llm_timeout, max_tokens = deadline.llm_limits(reserve_ms=VERIFICATION_STAGE_MS)
+        answer = llm_client.generate(prompt, system_prompt=SYSTEM_PROMPT, max_tokens=max_tokens, timeout=llm_timeout)
         
         # Check for refusal
         if extract_refusal_keywords(answer):
@@ -193,9 +209,27 @@ async def ask_question(
                 confidence=sum(s.similarity_score for s in sources_info) / len(sources_info)
             ))
         
-        # Verify faithfulness
-        verification_report = faithfulness_checker.verify_answer(answer, context_chunks)
+        # Verify faithfulness against the stored sentence embeddings of the context
+        sentence_rows = crud.get_chunk_sentences(db, [chunk['chunk_id'] for chunk in context_chunks])
+        attach_sentence_vectors(context_chunks, sentence_rows)
+        embedding_tier = deadline.allows(VERIFICATION_STAGE_MS)
+        if not embedding_tier:
+            deadline.degrade("verification_lexical_only")
+        verification_report = faithfulness_checker.verify_answer(answer, context_chunks, embedding_tier=embedding_tier)
         evaluation = scorer.evaluate(verification_report)
+        if evaluation['status'] == 'unverified':
+            deadline.degrade("verification_skipped")
+        sentence_checks = [
+            schema.SentenceCheck(
+                sentence=detail['sentence'],
+                supported=detail['supported'],
+                similarity=detail['max_similarity'],
+                supporting_sentence=detail['supporting_sentence'],
+                supporting_chunk_id=detail['supporting_chunk_id'],
+                tier=detail['tier']
+            )
+            for detail in verification_report['sentence_details']
+        ]
         
         # Check if we should refuse based on faithfulness
         if scorer.should_refuse(evaluation):
@@ -213,7 +247,8 @@ async def ask_question(
                 sources=sources_info,
                 faithfulness_score=verification_report['faithfulness_score'],
                 verification_status="failed",
-                confidence=sum(s.similarity_score for s in sources_info) / len(sources_info)
+                confidence=sum(s.similarity_score for s in sources_info) / len(sources_info),
+                sentence_checks=sentence_checks
             ))
         
         # Log successful query
@@ -232,7 +267,8 @@ async def ask_question(
             sources=sources_info,
             faithfulness_score=verification_report['faithfulness_score'],
             verification_status=evaluation['status'],
-            confidence=sum(s.similarity_score for s in sources_info) / len(sources_info)
+            confidence=sum(s.similarity_score for s in sources_info) / len(sources_info),
+            sentence_checks=sentence_checks
         ))
     
     except HTTPException:
@@ -2,6 +2,7 @@
 /materials and /ingest endpoints - Material management.
 """
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pathlib import Path
 from typing import List, Optional
@@ -10,9 +11,11 @@ import uuid
 import sys
 sys.path.append('../..')
 from db import get_db, crud, schema
-from ingestion import DocumentParser, TextChunker, MetadataExtractor
-from retrieval import get_embedder, get_vector_store
-from config import DATA_DIR, ALLOWED_EXTENSIONS, MAX_FILE_SIZE
+from ingestion import DocumentParser, TextChunker, MetadataExtractor, IngestionPipeline, IngestionParseError
+from retrieval import get_embedder, get_vector_store, index_write_lock
+from retrieval.embedding_pool import EmbeddingPool, use_embedding_pool
+from verification.sentence_index import build_sentence_rows
+from config import DATA_DIR, ALLOWED_EXTENSIONS, MAX_FILE_SIZE, SENTENCE_INDEX_ENABLED
 from api.endpoints.admin import reindex
 
 router = APIRouter()
@@ -25,6 +28,104 @@ async def list_materials(db: Session = Depends(get_db)):
     return materials
 
 
+def _validate_upload(file: UploadFile) -> str:
+    """Validate an uploaded file's extension and size, returning the extension."""
+    file_ext = Path(file.filename).suffix.lower()
+    if file_ext not in ALLOWED_EXTENSIONS:
+        allowed_list = ", ".join(ALLOWED_EXTENSIONS)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type '{file_ext}'. Please upload one of: {allowed_list}"
+        )
+    
+    # Check file size (basic validation)
+    if hasattr(file, 'size') and file.size and file.size > MAX_FILE_SIZE:
+        size_mb = file.size / (1024 * 1024)
+        max_mb = MAX_FILE_SIZE / (1024 * 1024)
+        raise HTTPException(
+            status_code=400,
+            detail=f"File too large ({size_mb:.1f}MB). Maximum size allowed: {max_mb:.0f}MB"
+        )
+    
+    return file_ext
+
+
+def _parse_and_chunk(
+    parse_path: Path,
+    file_path: Path,
+    filename: str,
+    material_type: str,
+    course: Optional[str]
+) -> List[dict]:
+    """
+    Parse a file and chunk its sections.
+    
+    Args:
+        parse_path: Path of the file to parse
+        file_path: Final path of the material (recorded in chunk metadata)
+        filename: Original filename
+        material_type: Type of material
+        course: Course name
+        
+    Returns:
+        List of chunk dictionaries with text and metadata
+    """
+    print(f"Parsing {filename}...")
+    try:
+        sections = DocumentParser.parse(str(parse_path))
+    except Exception as parse_error:
+        # Clean up uploaded file on parse error
+        if parse_path.exists():
+            parse_path.unlink()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Failed to parse file '{filename}'. The file may be corrupted or in an unsupported format. Error: {str(parse_error)}"
+        )
+    
+    # Extract base metadata
+    base_metadata = MetadataExtractor.extract_from_filename(
+        filename, material_type, course
+    )
+    base_metadata['material_file'] = str(file_path)
+    
+    # Chunk document
+    print(f"Chunking document...")
+    chunker = TextChunker()
+    
+    # Merge section metadata with base metadata, then chunk all sections at once
+    all_chunks = chunker.chunk_document_sections([
+        {
+            'text': section.get('text', ''),
+            'metadata': MetadataExtractor.merge_metadata(base_metadata, section.get('metadata', {}))
+        }
+        for section in sections
+    ])
+    
+    print(f"Created {len(all_chunks)} chunks")
+    
+    # Validate we got chunks
+    if not all_chunks:
+        if parse_path.exists() and parse_path != file_path:
+            parse_path.unlink()
+        raise HTTPException(
+            status_code=400,
+            detail=f"No text content could be extracted from '{filename}'. The file may be empty or contain only images."
+        )
+    
+    return all_chunks
+
+
+def _rollback_ingest(db: Session, material_id: int, file_path: Path):
+    """Remove everything a failed ingest committed: vectors, chunks, the material and its file."""
+    with index_write_lock():
+        vector_store = get_vector_store()
+        vector_store.remove_chunk_ids([c.chunk_id for c in crud.get_chunks_by_material(db, material_id)])
+        crud.delete_material(db, material_id)
+        vector_store.save(db_high_water_mark=crud.get_chunk_high_water_mark(db))
+    if file_path.exists():
+        file_path.unlink()
+
+
 @router.post("/ingest", response_model=schema.MaterialUploadResponse)
 async def ingest_material(
     file: UploadFile = File(...),
@@ -45,23 +146,7 @@ async def ingest_material(
         Upload response with material ID and chunk count
     """
     try:
-        # Validate file extension
-        file_ext = Path(file.filename).suffix.lower()
-        if file_ext not in ALLOWED_EXTENSIONS:
-            allowed_list = ", ".join(ALLOWED_EXTENSIONS)
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unsupported file type '{file_ext}'. Please upload one of: {allowed_list}"
-            )
-        
-        # Check file size (basic validation)
-        if hasattr(file, 'size') and file.size and file.size > MAX_FILE_SIZE:
-            size_mb = file.size / (1024 * 1024)
-            max_mb = MAX_FILE_SIZE / (1024 * 1024)
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large ({size_mb:.1f}MB). Maximum size allowed: {max_mb:.0f}MB"
-            )
+        _validate_upload(file)
         
         # We've removed the strict check for config.MATERIAL_TYPES to allow simplified uploads
         if not material_type:
@@ -81,92 +166,225 @@ async def ingest_material(
             db, file.filename, material_type, str(file_path), course
         )
         
-        # Parse document
-        print(f"Parsing {file.filename}...")
-        try:
-            sections = DocumentParser.parse(str(file_path))
-        except Exception as parse_error:
-            # Clean up uploaded file on parse error
-            if file_path.exists():
-                file_path.unlink()
-            raise HTTPException(
-                status_code=400,
-                detail=f"Failed to parse file '{file.filename}'. The file may be corrupted or in an unsupported format. Error: {str(parse_error)}"
-            )
-        
         # Extract base metadata
         base_metadata = MetadataExtractor.extract_from_filename(
             file.filename, material_type, course
         )
         base_metadata['material_file'] = str(file_path)
         
-        # Chunk document
-        print(f"Chunking document...")
-        chunker = TextChunker()
-        all_chunks = []
-        
-        for section in sections:
-            # Merge section metadata with base metadata
-            section_metadata = MetadataExtractor.merge_metadata(
-                base_metadata, section.get('metadata', {})
-            )
-            
-            # Chunk the section
-            chunks = chunker.chunk_text(section.get('text', ''), section_metadata)
-            all_chunks.extend(chunks)
-        
-        print(f"Created {len(all_chunks)} chunks")
+        # Stream parse -> chunk -> embed -> index in micro-batches, off the
+        # event loop so queries keep being served during the upload
+        print(f"Ingesting {file.filename}...")
+        pipeline = IngestionPipeline(get_embedder())
+        try:
+            chunk_count = await run_in_threadpool(pipeline.run, db, material.id, str(file_path), base_metadata)
+        except Exception as ingest_error:
+            # Roll back anything committed before the failure, whichever stage it came from
+            await run_in_threadpool(_rollback_ingest, db, material.id, file_path)
+            if isinstance(ingest_error, IngestionParseError):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Failed to parse file '{file.filename}'. The file may be corrupted or in an unsupported format. Error: {str(ingest_error)}"
+                )
+            raise
         
         # Validate we got chunks
-        if not all_chunks:
+        if not chunk_count:
+            await run_in_threadpool(_rollback_ingest, db, material.id, file_path)
             raise HTTPException(
                 status_code=400,
                 detail=f"No text content could be extracted from '{file.filename}'. The file may be empty or contain only images."
             )
         
-        # Generate embeddings
-        print(f"Generating embeddings...")
-        embedder = get_embedder()
-        chunk_texts = [chunk['text'] for chunk in all_chunks]
-        embeddings = embedder.embed_batch(chunk_texts)
+        print(f"Successfully ingested {file.filename} into {chunk_count} chunks")
         
-        # Add to vector store
-        print(f"Adding to vector store...")
+        return schema.MaterialUploadResponse(
+            material_id=material.id,
+            filename=file.filename,
+            chunk_count=chunk_count,
+            message=f"Successfully processed {file.filename} into {chunk_count} chunks"
+        )
+    
+    except HTTPException:
+        raise
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+
+
+def _apply_replace(
+    db: Session,
+    material_id: int,
+    unchanged_updates: List[tuple],
+    new_chunks: List[tuple],
+    embeddings,
+    sentence_rows,
+    removed_ids: List[str],
+    chunk_count: int,
+    staged_path: Path,
+    file_path: Path,
+    old_file_path: Path,
+    filename: str
+):
+    """
+    Commit a replace to the database, the index and the file system under the index write lock.
+    
+    New chunk rows are committed before their vectors are added, so any
+    vector found by /ask resolves to a chunk; if adding the vectors fails,
+    the new rows are deleted again.
+    """
+    with index_write_lock():
         vector_store = get_vector_store()
-        chunk_ids = [str(uuid.uuid4()) for _ in all_chunks]
-        vector_store.add_embeddings(embeddings, chunk_ids)
         
-        # Save chunks to database
-        print(f"Saving chunks to database...")
-        for i, (chunk, chunk_id) in enumerate(zip(all_chunks, chunk_ids)):
-            # Create full metadata
+        # One transaction for all unchanged chunks rather than one per chunk
+        crud.update_chunks(db, unchanged_updates)
+        
+        if new_chunks:
+            new_ids = [metadata['chunk_id'] for _, metadata, _ in new_chunks]
+            crud.create_chunks(db, [
+                {
+                    'chunk_id': full_metadata['chunk_id'],
+                    'material_id': material_id,
+                    'embedding_id': i,
+                    'chunk_metadata': full_metadata,
+                    'text': text
+                }
+                for i, full_metadata, text in new_chunks
+            ], sentence_rows)
+            try:
+                vector_store.add_embeddings(embeddings, new_ids)
+            except Exception:
+                # Leave no chunk rows without vectors behind
+                db.rollback()
+                crud.delete_chunks(db, new_ids)
+                raise
+        
+        if removed_ids:
+            print(f"Removing {len(removed_ids)} chunks no longer present...")
+            crud.delete_chunks(db, removed_ids)
+            vector_store.remove_chunk_ids(removed_ids)
+        
+        crud.update_material_chunk_count(db, material_id, chunk_count)
+        
+        staged_path.replace(file_path)
+        if old_file_path != file_path and old_file_path.exists():
+            old_file_path.unlink()
+        crud.update_material_file(db, material_id, filename, str(file_path))
+        
+        vector_store.save(db_high_water_mark=crud.get_chunk_high_water_mark(db))
+
+
+@router.put("/materials/{material_id}", response_model=schema.MaterialReplaceResponse)
+async def replace_material(
+    material_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Replace a material's file, re-embedding only the chunks that changed.
+    
+    Chunks whose content hash matches a stored chunk keep their chunk ID and
+    vector; new or edited chunks are embedded, and chunks that disappeared are
+    removed from the index and database.
+    
+    Args:
+        material_id: ID of the material to replace
+        file: Replacement file
+        db: Database session
+        
+    Returns:
+        Replace response with added/removed/unchanged chunk counts
+    """
+    material = crud.get_material(db, material_id)
+    if not material:
+        raise HTTPException(status_code=404, detail="Material not found")
+    
+    staged_path = None
+    try:
+        file_ext = _validate_upload(file)
+        
+        material_dir = Path(DATA_DIR) / f"{material.material_type}s"
+        material_dir.mkdir(parents=True, exist_ok=True)
+        file_path = material_dir / file.filename
+        old_file_path = Path(material.file_path)
+        
+        # Stage the upload next to its final location so a failed parse
+        # never clobbers the file currently backing the material
+        staged_path = material_dir / f".{uuid.uuid4().hex}{file_ext}"
+        with open(staged_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+        
+        all_chunks = await run_in_threadpool(
+            _parse_and_chunk, staged_path, file_path, file.filename, material.material_type, material.course
+        )
+        
+        # Index stored chunks by content hash (several chunks may share text)
+        stored_by_hash = {}
+        for stored in crud.get_chunks_by_material(db, material_id):
+            content_hash = stored.chunk_metadata.get('content_hash') or MetadataExtractor.content_hash(stored.text)
+            stored_by_hash.setdefault(content_hash, []).append(stored)
+        
+        new_chunks = []
+        unchanged_updates = []
+        for i, chunk in enumerate(all_chunks):
             full_metadata = MetadataExtractor.create_chunk_metadata(
                 chunk['metadata'],
                 chunk['text']
             )
-            full_metadata['chunk_id'] = chunk_id
-            
-            crud.create_chunk(
-                db, chunk_id, material.id, i, full_metadata, chunk['text']
-            )
+            matches = stored_by_hash.get(full_metadata['content_hash'])
+            if matches:
+                # Unchanged chunk: keep its ID and vector, refresh position and metadata
+                stored = matches.pop(0)
+                full_metadata['chunk_id'] = stored.chunk_id
+                unchanged_updates.append((stored.chunk_id, i, full_metadata))
+            else:
+                full_metadata['chunk_id'] = str(uuid.uuid4())
+                new_chunks.append((i, full_metadata, chunk['text']))
         
-        # Update material chunk count
-        crud.update_material_chunk_count(db, material.id, len(all_chunks))
+        removed_ids = [stored.chunk_id for matches in stored_by_hash.values() for stored in matches]
+        unchanged = len(unchanged_updates)
         
-        # Save vector store
-        vector_store.save()
+        embeddings = None
+        sentence_rows = None
+        if new_chunks:
+            print(f"Generating embeddings for {len(new_chunks)} new or changed chunks...")
+            embedder = get_embedder()
+            texts = [text for _, _, text in new_chunks]
+            if use_embedding_pool(len(texts)):
+                with EmbeddingPool() as pool:
+                    embeddings = await run_in_threadpool(pool.embed, texts)
+            else:
+                embeddings = await run_in_threadpool(embedder.embed_batch, texts)
+            if SENTENCE_INDEX_ENABLED:
+                sentence_rows = await run_in_threadpool(
+                    build_sentence_rows, embedder, [(metadata['chunk_id'], text) for _, metadata, text in new_chunks]
+                )
         
-        print(f"Successfully ingested {file.filename}")
+        # DB writes, index changes, file moves and the snapshot save stay off the event loop
+        await run_in_threadpool(
+            _apply_replace, db, material_id, unchanged_updates, new_chunks, embeddings, sentence_rows,
+            removed_ids, len(all_chunks), staged_path, file_path, old_file_path, file.filename
+        )
         
-        return schema.MaterialUploadResponse(
-            material_id=material.id,
+        print(f"Successfully replaced material {material_id} with {file.filename}")
+        
+        return schema.MaterialReplaceResponse(
+            material_id=material_id,
             filename=file.filename,
             chunk_count=len(all_chunks),
-            message=f"Successfully processed {file.filename} into {len(all_chunks)} chunks"
+            chunks_added=len(new_chunks),
+            chunks_removed=len(removed_ids),
+            chunks_unchanged=unchanged,
+            message=f"Replaced {file.filename}: {len(new_chunks)} chunks embedded, {len(removed_ids)} removed, {unchanged} unchanged"
         )
     
+    except HTTPException:
+        raise
+    
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+        if staged_path is not None and staged_path.exists():
+            staged_path.unlink()
+        raise HTTPException(status_code=500, detail=f"Error replacing file: {str(e)}")
 
 
 @router.delete("/materials/{material_id}")
@@ -177,8 +395,8 @@ async def delete_material(material_id: int, db: Session = Depends(get_db)):
     if not success:
         raise HTTPException(status_code=404, detail="Material not found")
     
-    # Automatically reindex to remove vectors
-    # This might be slow for large datasets, but ensures consistency
-    await reindex(db)
+    # Automatically reindex to remove vectors, reusing the stored vectors of
+    # the remaining chunks so nothing is re-embedded
+    await reindex(db, reuse_vectors=True)
     
     return {"message": "Material deleted and index updated."}
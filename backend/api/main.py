@@ -2,31 +2,31 @@
 FastAPI main application.
 """
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 import sys
 sys.path.append('..')
-from config import CORS_ORIGINS, RERANK_ENABLED
+from config import CORS_ORIGINS
 from db import init_db
-from retrieval import get_embedder, get_vector_store, get_reranker
 from api.endpoints import ask, materials, source, logs, admin, chat, files
-from retrieval import get_vector_store
+from retrieval import peek_vector_store
 from llm import get_llm_client
+from api.warmup import record_phase, start_warmup, get_warmup_status
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events."""
     print("Initializing database...")
-    init_db()
+    record_phase("init_db", init_db)
     print("Database initialized")
     
-    # Preload models
-    print("Preloading retrieval models...")
-    get_embedder()
-    get_vector_store()
-    if RERANK_ENABLED:
-        get_reranker()
-    print("Models loaded")
+    # Load models and the index in the background so the server starts
+    # accepting connections immediately; /ready reports when warm-up is done
+    print("Warming up models in the background...")
+    start_warmup()
     
     yield
     
@@ -67,21 +67,39 @@ async def root():
             "ask": "POST /ask - Ask a question",
             "materials": "GET /materials - List materials",
             "ingest": "POST /ingest - Upload material",
+            "replace": "PUT /materials/{material_id} - Replace a material's file",
             "source": "GET /source/{chunk_id} - Get chunk details",
             "logs": "GET /logs/{log_id} - Get query log",
-            "reindex": "POST /admin/reindex - Rebuild index"
+            "reindex": "POST /admin/reindex - Rebuild index",
+            "verify_index": "POST /admin/verify-index - Check and repair index/database drift",
+            "ready": "GET /ready - Model warm-up status"
         }
     }
 
 
 @app.get("/health")
 async def health():
-    """Health check endpoint."""
-    vector_store = get_vector_store()
-    llm_client = get_llm_client()
+    """
+    Health check endpoint.
+    
+    Never loads the index (warm-up does that) and runs the blocking LLM
+    availability request in the threadpool, so it cannot stall the event loop.
+    """
+    vector_store = peek_vector_store()
+    llm_available = await run_in_threadpool(get_llm_client().check_availability)
     
     return {
         "status": "healthy",
-        "vector_store_size": vector_store.get_size(),
-        "llm_available": llm_client.check_availability()
+        "vector_store_loaded": vector_store is not None,
+        "vector_store_size": vector_store.get_size() if vector_store is not None else None,
+        "llm_available": llm_available
     }
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness endpoint: 200 once models are warmed up, 503 until then."""
+    status = get_warmup_status()
+    if not status.ready:
+        return JSONResponse(status_code=503, content=status.to_dict())
+    return status.to_dict()
@@ -0,0 +1,146 @@
+"""
+Pre-fork server: load models once, then fork workers that share them.
+
+The master process imports the app, loads every model and the index, binds
+the listening socket and forks PREFORK_WORKERS children. Model weights and
+the index are inherited copy-on-write, so each extra worker only adds its
+own heap and activations instead of another copy of every model.
+
+No inference runs in the master: torch's intra-op thread pool does not
+survive fork, so each worker runs its own warm-up after forking. Each
+worker also takes an equal share of the CPU cores and of the LLM rate
+limits, which apply to the provider account as a whole.
+"""
+import gc
+import os
+import signal
+import socket
+import time
+import uvicorn
+import sys
+sys.path.append('..')
+from config import RERANK_ENABLED, VERIFICATION_ENABLED, INDEX_SHARED_MODE
+from db import init_db
+from db.models import engine
+from retrieval import get_embedder, get_vector_store, get_reranker
+from verification import get_faithfulness_checker
+from llm import split_llm_budget
+from api.warmup import record_phase, check_index_freshness
+from api.main import app
+
+
+def _preload():
+    """Load models and the index in the master process, without running inference."""
+    record_phase("init_db", init_db)
+    record_phase("embedder_load", get_embedder)
+    vector_store = record_phase("vector_store_load", get_vector_store)
+    record_phase("index_freshness_check", lambda: check_index_freshness(vector_store))
+    if RERANK_ENABLED:
+        record_phase("reranker_load", get_reranker)
+    if VERIFICATION_ENABLED:
+        record_phase("verifier_load", get_faithfulness_checker)
+    
+    # SQLite connections must not be shared across fork; workers open their own
+    engine.dispose()
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _limit_torch_threads(workers: int):
+    """Split the CPU cores between workers instead of each using all of them."""
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+
+def _run_worker(app, sock: socket.socket, workers: int):
+    """Body of a forked worker; never returns."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    exit_code = 0
+    try:
+        _limit_torch_threads(workers)
+        split_llm_budget(workers)
+        server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+        server.run(sockets=[sock])
+    except Exception as e:
+        print(f"Worker {os.getpid()} crashed: {e}")
+        exit_code = 1
+    finally:
+        os._exit(exit_code)
+
+
+def serve_prefork(workers: int, host: str, port: int):
+    """
+    Run the API with workers forked from a master that holds the loaded models.
+    
+    Args:
+        workers: Number of worker processes
+        host: Interface to bind
+        port: Port to bind
+    """
+    if workers > 1 and not INDEX_SHARED_MODE:
+        raise RuntimeError("PREFORK_WORKERS > 1 requires INDEX_SHARED_MODE = True so index writes reach every worker")
+    
+    print(f"Preloading models in master process {os.getpid()}...")
+    _preload()
+    sock = _bind_socket(host, port)
+    
+    # Move everything loaded so far out of the collector's reach, so gc passes
+    # in the workers do not touch (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
+    
+    children = {}
+    shutting_down = False
+    
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(app, sock, workers)
+        children[pid] = time.monotonic()
+        print(f"Started worker {pid}")
+    
+    def stop(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    
+    for _ in range(workers):
+        spawn()
+    print(f"Serving on http://{host}:{port} with {workers} workers")
+    
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        
+        started_at = children.pop(pid, None)
+        if started_at is None or shutting_down:
+            continue
+        
+        print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting")
+        # Avoid a tight restart loop when workers die right after starting
+        if time.monotonic() - started_at < 1.0:
+            time.sleep(1.0)
+        spawn()
+    
+    sock.close()
+    print("All workers stopped")
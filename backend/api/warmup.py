@@ -0,0 +1,112 @@
+"""
+Background model warm-up and readiness tracking.
+"""
+import threading
+import time
+from typing import Callable, Dict
+import sys
+sys.path.append('..')
+from config import RERANK_ENABLED, VERIFICATION_ENABLED
+from db import crud
+from db.models import SessionLocal
+from retrieval import get_embedder, get_vector_store, get_reranker
+from retrieval.model_registry import loaded_models
+from verification import get_faithfulness_checker
+
+
+class WarmupState:
+    """Progress of the background warm-up."""
+    
+    def __init__(self):
+        self.ready = False
+        self.error = None
+        self.current_phase = None
+        self.phases: Dict[str, float] = {}  # phase name -> seconds
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+    
+    def to_dict(self) -> Dict:
+        """Serializable status for the /ready endpoint."""
+        end = self.finished_at or time.perf_counter()
+        return {
+            "status": "ready" if self.ready else ("failed" if self.error else "warming_up"),
+            "current_phase": self.current_phase,
+            "phases": dict(self.phases),
+            "elapsed_seconds": round(end - self.started_at, 3),
+            "models": loaded_models(),
+            "error": self.error
+        }
+
+
+_state = WarmupState()
+
+
+def record_phase(name: str, fn: Callable):
+    """Run one startup phase and record how long it took."""
+    _state.current_phase = name
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _state.phases[name] = round(elapsed, 3)
+    print(f"Startup phase '{name}' took {elapsed:.2f}s")
+    return result
+
+
+def check_index_freshness(vector_store):
+    """Warn when the loaded snapshot predates chunks committed to the database."""
+    manifest = vector_store.manifest
+    if not manifest or manifest.get('db_high_water_mark') is None:
+        return
+    
+    db = SessionLocal()
+    try:
+        high_water_mark = crud.get_chunk_high_water_mark(db)
+    finally:
+        db.close()
+    
+    if high_water_mark != manifest['db_high_water_mark']:
+        print(
+            f"Warning: index snapshot v{manifest['version']} was written at chunk high-water mark "
+            f"{manifest['db_high_water_mark']}, database is at {high_water_mark}. Index may be out of sync; run POST /admin/verify-index."
+        )
+
+
+def _warm_up():
+    """Load models and the index, running a dummy inference through each model."""
+    try:
+        record_phase("embedder_load", get_embedder)
+        record_phase("embedder_warmup", lambda: get_embedder().embed_text("warm-up"))
+        
+        vector_store = record_phase("vector_store_load", get_vector_store)
+        record_phase("index_freshness_check", lambda: check_index_freshness(vector_store))
+        
+        if RERANK_ENABLED:
+            record_phase("reranker_load", get_reranker)
+            record_phase("reranker_warmup", lambda: get_reranker().rerank("warm-up", [("warm-up", "warm-up", 0.0)]))
+        
+        if VERIFICATION_ENABLED:
+            record_phase("verifier_load", get_faithfulness_checker)
+            record_phase("verifier_warmup", lambda: get_faithfulness_checker().check_sentence_support(
+                "This is a warm-up sentence.", ["This is a warm-up sentence."]
+            ))
+        
+        _state.ready = True
+        print(f"Warm-up complete in {time.perf_counter() - _state.started_at:.2f}s")
+    except Exception as e:
+        _state.error = str(e)
+        print(f"Warm-up failed: {e}")
+    finally:
+        _state.current_phase = None
+        _state.finished_at = time.perf_counter()
+
+
+def start_warmup() -> threading.Thread:
+    """Start warming up models in a background thread."""
+    thread = threading.Thread(target=_warm_up, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def get_warmup_status() -> WarmupState:
+    """Get the warm-up state."""
+    return _state
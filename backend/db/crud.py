@@ -1,8 +1,9 @@
 """
 CRUD operations for database interactions.
 """
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 from . import models, schema
 
@@ -46,11 +47,25 @@ def update_material_chunk_count(db: Session, material_id: int, chunk_count: int)
         db.commit()
 
 
+def update_material_file(db: Session, material_id: int, filename: str, file_path: str) -> Optional[models.Material]:
+    """Point a material at a replacement file."""
+    material = get_material(db, material_id)
+    if material:
+        material.filename = filename
+        material.file_path = file_path
+        material.upload_date = datetime.utcnow()
+        db.commit()
+        db.refresh(material)
+    return material
+
+
 def delete_material(db: Session, material_id: int):
     """Delete a material and its chunks."""
     material = db.query(models.Material).filter(models.Material.id == material_id).first()
     if material:
         # Delete chunks first
+        chunk_ids = [row[0] for row in db.query(models.Chunk.chunk_id).filter(models.Chunk.material_id == material_id).all()]
+        db.query(models.ChunkSentences).filter(models.ChunkSentences.chunk_id.in_(chunk_ids)).delete(synchronize_session=False)
         db.query(models.Chunk).filter(models.Chunk.material_id == material_id).delete()
         # Delete material
         db.delete(material)
@@ -73,11 +88,96 @@ def create_chunk(db: Session, chunk_id: str, material_id: int, embedding_id: int
     return db_chunk
 
 
+def create_chunks(db: Session, chunks: List[Dict], sentence_rows: Optional[List[Dict]] = None) -> int:
+    """
+    Create many chunks in a single transaction.
+    
+    Args:
+        chunks: Dicts with chunk_id, material_id, embedding_id, chunk_metadata and text
+        sentence_rows: Optional sentence embedding rows for the chunks
+            (chunk_id, sentences, embeddings, dimension)
+    """
+    db.add_all([models.Chunk(**chunk) for chunk in chunks])
+    if sentence_rows:
+        db.add_all([models.ChunkSentences(**row) for row in sentence_rows])
+    db.commit()
+    return len(chunks)
+
+
+def update_chunks(db: Session, updates: List[Tuple[str, int, Dict]]) -> int:
+    """
+    Update the position and metadata of many unchanged chunks in a single transaction.
+    
+    Args:
+        updates: (chunk_id, embedding_id, chunk_metadata) tuples
+    """
+    if not updates:
+        return 0
+    db.bulk_update_mappings(models.Chunk, [
+        {'chunk_id': chunk_id, 'embedding_id': embedding_id, 'chunk_metadata': chunk_metadata}
+        for chunk_id, embedding_id, chunk_metadata in updates
+    ])
+    db.commit()
+    return len(updates)
+
+
+def delete_chunks(db: Session, chunk_ids: List[str]) -> int:
+    """Delete chunks by ID."""
+    if not chunk_ids:
+        return 0
+    deleted = db.query(models.Chunk).filter(models.Chunk.chunk_id.in_(chunk_ids)).delete(synchronize_session=False)
+    db.query(models.ChunkSentences).filter(models.ChunkSentences.chunk_id.in_(chunk_ids)).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
 def get_chunk(db: Session, chunk_id: str) -> Optional[models.Chunk]:
     """Get a chunk by ID."""
     return db.query(models.Chunk).filter(models.Chunk.chunk_id == chunk_id).first()
 
 
+def get_chunk_high_water_mark(db: Session) -> int:
+    """Highest chunk rowid, recorded in index snapshot manifests."""
+    return db.execute(text(f"SELECT MAX(rowid) FROM {models.Chunk.__tablename__}")).scalar() or 0
+
+
+def get_chunk_texts(db: Session, chunk_ids: List[str], batch_size: int = 500) -> List[tuple]:
+    """Get (chunk_id, text) pairs for chunk IDs, querying in batches."""
+    rows = []
+    for start in range(0, len(chunk_ids), batch_size):
+        batch = chunk_ids[start:start + batch_size]
+        rows.extend(
+            db.query(models.Chunk.chunk_id, models.Chunk.text)
+            .filter(models.Chunk.chunk_id.in_(batch))
+            .all()
+        )
+    return [tuple(row) for row in rows]
+
+
+def replace_chunk_sentences(db: Session, sentence_rows: List[Dict]) -> int:
+    """Store sentence embedding rows, replacing any existing rows for the same chunks."""
+    if not sentence_rows:
+        return 0
+    chunk_ids = [row['chunk_id'] for row in sentence_rows]
+    db.query(models.ChunkSentences).filter(models.ChunkSentences.chunk_id.in_(chunk_ids)).delete(synchronize_session=False)
+    db.add_all([models.ChunkSentences(**row) for row in sentence_rows])
+    db.commit()
+    return len(sentence_rows)
+
+
+def get_chunk_sentences(db: Session, chunk_ids: List[str]) -> Dict[str, models.ChunkSentences]:
+    """Get stored sentence embedding rows keyed by chunk ID."""
+    if not chunk_ids:
+        return {}
+    rows = db.query(models.ChunkSentences).filter(models.ChunkSentences.chunk_id.in_(chunk_ids)).all()
+    return {row.chunk_id: row for row in rows}
+
+
+def get_chunk_ids_with_sentences(db: Session) -> List[str]:
+    """Get the IDs of all chunks that have stored sentence embeddings."""
+    return [row[0] for row in db.query(models.ChunkSentences.chunk_id).all()]
+
+
 def get_chunks_by_material(db: Session, material_id: int) -> List[models.Chunk]:
     """Get all chunks for a material."""
     return db.query(models.Chunk).filter(models.Chunk.material_id == material_id).all()
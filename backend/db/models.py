@@ -2,7 +2,7 @@
 Database models and setup for the RAG Interview Assistant.
 Uses SQLAlchemy for ORM and SQLite for local storage.
 """
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, Text, JSON
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, Text, JSON, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -38,6 +38,16 @@ class Chunk(Base):
     text = Column(Text, nullable=False)
     
 
+class ChunkSentences(Base):
+    """Stores the sentences of a chunk and their embeddings for verification."""
+    __tablename__ = "chunk_sentences"
+    
+    chunk_id = Column(String, primary_key=True, index=True)
+    sentences = Column(JSON, nullable=False)  # list of sentence strings
+    embeddings = Column(LargeBinary, nullable=False)  # float16 array, len(sentences) x dimension
+    dimension = Column(Integer, nullable=False)
+    
+
 class ChatSession(Base):
     """Stores chat session metadata."""
     __tablename__ = "chat_sessions"
@@ -23,6 +23,17 @@ class MaterialUploadResponse(BaseModel):
     message: str
 
 
+class MaterialReplaceResponse(BaseModel):
+    """Response after replacing a material's file."""
+    material_id: int
+    filename: str
+    chunk_count: int
+    chunks_added: int
+    chunks_removed: int
+    chunks_unchanged: int
+    message: str
+
+
 class MaterialListItem(BaseModel):
     """Item in the materials list."""
     id: int
@@ -62,6 +73,17 @@ class QueryRequest(BaseModel):
     filters: Optional[QueryFilters] = None
     top_k: Optional[int] = 12
     session_id: Optional[str] = None
+    latency_budget_ms: Optional[int] = Field(None, gt=0)  # overrides ASK_LATENCY_BUDGET_MS
+
+
+class SentenceCheck(BaseModel):
+    """Verification result for one answer sentence."""
+    sentence: str
+    supported: bool
+    similarity: float
+    supporting_sentence: Optional[str] = None  # best matching context sentence
+    supporting_chunk_id: Optional[str] = None
+    tier: Optional[str] = None  # lexical, embedding, or unverified
 
 
 class QueryResponse(BaseModel):
@@ -69,8 +91,10 @@ class QueryResponse(BaseModel):
     answer: str
     sources: List[SourceInfo]
     faithfulness_score: Optional[float] = None
-    verification_status: str  # passed, failed, warning, disabled
+    verification_status: str  # passed, failed, warning, disabled, unverified
     confidence: float  # average similarity score
+    sentence_checks: Optional[List[SentenceCheck]] = None
+    degradations: List[str] = []  # stages skipped or downgraded to meet the latency budget
 
 
 class ChunkDetail(BaseModel):
@@ -88,6 +112,20 @@ class ReindexResponse(BaseModel):
     materials_processed: int
 
 
+class VerifyIndexResponse(BaseModel):
+    """Result of comparing the vector index with the database."""
+    index_size: int
+    db_chunks: int
+    orphan_count: int  # vectors whose chunk is not in the database
+    missing_count: int  # database chunks without a vector
+    duplicate_count: int  # chunks with more than one vector
+    orphans: List[str]  # sample of orphan chunk IDs
+    missing: List[str]  # sample of missing chunk IDs
+    consistent: bool
+    repaired: bool
+    message: str
+
+
 # Chat Schemas
 class ChatSessionCreate(BaseModel):
     title: Optional[str] = None
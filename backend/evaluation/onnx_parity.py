@@ -0,0 +1,141 @@
+"""
+Parity check between the torch models and their ONNX exports.
+
+Run before switching INFERENCE_BACKEND to "onnx": embeddings of stored
+chunks are compared by cosine similarity, and cross-encoder scores by
+absolute difference and ranking agreement.
+"""
+import sys
+sys.path.append('..')
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+from db import get_db, models
+from config import EMBEDDING_MODEL, RERANK_MODEL, ONNX_QUANTIZE, LOGS_DIR
+from retrieval.onnx_backend import OnnxSentenceEncoder, OnnxCrossEncoder
+
+SAMPLE_TEXTS = [
+    "Backpropagation computes gradients of the loss with respect to every weight.",
+    "A hash table offers expected constant-time lookups.",
+    "Dynamic programming stores solutions of overlapping subproblems.",
+    "TCP provides reliable, ordered delivery of a byte stream.",
+    "Gradient descent updates parameters in the direction of the negative gradient."
+]
+
+
+def load_sample_texts(limit: int) -> List[str]:
+    """Chunk texts from the database, or built-in samples if it is empty."""
+    db = next(get_db())
+    texts = [row[0] for row in db.query(models.Chunk.text).limit(limit).all()]
+    return texts or SAMPLE_TEXTS
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def check_embedding_parity(texts: List[str], quantize: bool = ONNX_QUANTIZE) -> Dict:
+    """
+    Compare ONNX and torch embeddings of the same texts.
+    
+    Args:
+        texts: Texts to embed
+        quantize: Check the int8 export instead of the fp32 one
+    
+    Returns:
+        Cosine agreement statistics
+    """
+    from sentence_transformers import SentenceTransformer
+    
+    reference = _normalize(SentenceTransformer(EMBEDDING_MODEL, device='cpu').encode(texts, convert_to_numpy=True))
+    candidate = _normalize(OnnxSentenceEncoder(EMBEDDING_MODEL, quantize=quantize).encode(texts))
+    cosines = (reference * candidate).sum(axis=1)
+    
+    return {
+        'texts': len(texts),
+        'mean_cosine': float(cosines.mean()),
+        'min_cosine': float(cosines.min()),
+        'p01_cosine': float(np.percentile(cosines, 1))
+    }
+
+
+def _ranks(scores: np.ndarray) -> np.ndarray:
+    ranks = np.empty(len(scores))
+    ranks[np.argsort(scores)] = np.arange(len(scores))
+    return ranks
+
+
+def check_reranker_parity(texts: List[str], quantize: bool = ONNX_QUANTIZE) -> Dict:
+    """
+    Compare ONNX and torch cross-encoder scores, using the first sentences
+    of a few passages as queries against the first 20 passages.
+    
+    Args:
+        texts: Passages to score
+        quantize: Check the int8 export instead of the fp32 one
+    
+    Returns:
+        Score difference and ranking agreement statistics
+    """
+    from sentence_transformers import CrossEncoder
+    
+    reference_model = CrossEncoder(RERANK_MODEL, device='cpu')
+    candidate_model = OnnxCrossEncoder(RERANK_MODEL, quantize=quantize)
+    
+    passages = texts[:20]
+    queries = [text.split('.')[0][:200] for text in passages[:5]]
+    max_abs_diff = 0.0
+    rank_correlations = []
+    top1_agreement = 0
+    for query in queries:
+        pairs = [[query, passage] for passage in passages]
+        reference = np.asarray(reference_model.predict(pairs), dtype=np.float32)
+        candidate = np.asarray(candidate_model.predict(pairs), dtype=np.float32)
+        max_abs_diff = max(max_abs_diff, float(np.abs(reference - candidate).max()))
+        if len(passages) > 1:
+            rank_correlations.append(float(np.corrcoef(_ranks(reference), _ranks(candidate))[0, 1]))
+        top1_agreement += int(reference.argmax() == candidate.argmax())
+    
+    return {
+        'queries': len(queries),
+        'passages': len(passages),
+        'max_abs_score_diff': max_abs_diff,
+        'mean_rank_correlation': float(np.mean(rank_correlations)) if rank_correlations else 1.0,
+        'top1_agreement': top1_agreement / len(queries) if queries else 1.0
+    }
+
+
+def save_parity_results(results: Dict, filename: str = "onnx_parity.json"):
+    """Save parity results to logs directory."""
+    logs_path = Path(LOGS_DIR) / filename
+    with open(logs_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {logs_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare ONNX exports against the torch models")
+    parser.add_argument("--limit", type=int, default=500, help="chunks to sample from the database")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="fail below this minimum embedding cosine")
+    parser.add_argument("--fp32", action="store_true", help="check the fp32 export instead of int8")
+    parser.add_argument("--skip-reranker", action="store_true", help="only check the embedding model")
+    args = parser.parse_args()
+    
+    quantize = not args.fp32
+    texts = load_sample_texts(args.limit)
+    print(f"Checking {'int8' if quantize else 'fp32'} ONNX parity on {len(texts)} texts...")
+    
+    results = {'quantized': quantize, 'embedding': check_embedding_parity(texts, quantize)}
+    if not args.skip_reranker:
+        results['reranker'] = check_reranker_parity(texts, quantize)
+    
+    print("\nResults:")
+    print(json.dumps(results, indent=2))
+    save_parity_results(results)
+    
+    if results['embedding']['min_cosine'] < args.min_cosine:
+        print(f"\nFAIL: minimum embedding cosine {results['embedding']['min_cosine']:.4f} < {args.min_cosine}")
+        sys.exit(1)
+    print("\nPASS")
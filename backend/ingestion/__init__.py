@@ -2,5 +2,6 @@
 from .parsers import DocumentParser
 from .chunker import TextChunker
 from .metadata_extractor import MetadataExtractor
+from .pipeline import IngestionPipeline, IngestionParseError
 
-__all__ = ["DocumentParser", "TextChunker", "MetadataExtractor"]
+__all__ = ["DocumentParser", "TextChunker", "MetadataExtractor", "IngestionPipeline", "IngestionParseError"]
@@ -1,32 +1,48 @@
 """
 Text chunking with section-awareness and configurable parameters.
 """
+import re
 import tiktoken
-from typing import List, Dict
+from itertools import accumulate
+from typing import Dict, Iterable, Iterator, List, Tuple
 import sys
 sys.path.append('..')
-from config import CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_MIN_SIZE
+from config import CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_MIN_SIZE, CHUNK_TOKENIZER_THREADS
 
 
 class TextChunker:
     """Intelligent text chunking with overlap and section awareness."""
     
-    def __init__(self, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP):
+    def __init__(
+        self,
+        chunk_size: int = CHUNK_SIZE,
+        overlap: int = CHUNK_OVERLAP,
+        num_threads: int = CHUNK_TOKENIZER_THREADS
+    ):
         """
         Initialize chunker.
         
         Args:
             chunk_size: Target chunk size in tokens
             overlap: Overlap size in tokens
+            num_threads: Threads used for batched tokenization
         """
         self.chunk_size = chunk_size
         self.overlap = overlap
+        self.num_threads = num_threads
         self.encoding = tiktoken.get_encoding("cl100k_base")  # GPT-4 encoding
     
     def count_tokens(self, text: str) -> int:
         """Count tokens in text."""
         return len(self.encoding.encode(text))
     
+    def _count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Count tokens for many texts in one parallel tiktoken call."""
+        if not texts:
+            return []
+        encoded = self.encoding.encode_ordinary_batch(texts, num_threads=self.num_threads)
+        return [len(tokens) for tokens in encoded]
+    
     def chunk_text(self, text: str, metadata: Dict = None) -> List[Dict]:
         """
         Chunk text into overlapping segments.
@@ -38,138 +54,146 @@ class TextChunker:
         Returns:
             List of chunk dictionaries with text and metadata
         """
-        if not text or not text.strip():
-            return []
-        
-        metadata = metadata or {}
-        
-        # Split into sentences for better chunking
-        sentences = self._split_sentences(text)
-        
-        chunks = []
-        current_chunk = []
-        current_tokens = 0
-        
-        for sentence in sentences:
-            sentence_tokens = self.count_tokens(sentence)
-            
-            # If single sentence exceeds chunk size, split it
-            if sentence_tokens > self.chunk_size:
-                # Save current chunk if exists
-                if current_chunk:
-                    chunks.append({
-                        'text': ' '.join(current_chunk),
-                        'metadata': metadata.copy()
-                    })
-                    current_chunk = []
-                    current_tokens = 0
-                
-                # Split long sentence by words
-                words = sentence.split()
-                temp_chunk = []
-                temp_tokens = 0
-                
-                for word in words:
-                    word_tokens = self.count_tokens(word + ' ')
-                    if temp_tokens + word_tokens > self.chunk_size and temp_chunk:
-                        chunks.append({
-                            'text': ' '.join(temp_chunk),
-                            'metadata': metadata.copy()
-                        })
-                        # Keep overlap
-                        overlap_words = self._get_overlap_words(temp_chunk)
-                        temp_chunk = overlap_words
-                        temp_tokens = self.count_tokens(' '.join(temp_chunk))
-                    
-                    temp_chunk.append(word)
-                    temp_tokens += word_tokens
-                
-                if temp_chunk:
-                    current_chunk = temp_chunk
-                    current_tokens = temp_tokens
-                continue
-            
-            # Check if adding sentence exceeds chunk size
-            if current_tokens + sentence_tokens > self.chunk_size and current_chunk:
-                # Save current chunk
-                chunks.append({
-                    'text': ' '.join(current_chunk),
-                    'metadata': metadata.copy()
-                })
-                
-                # Start new chunk with overlap
-                overlap_sentences = self._get_overlap_sentences(current_chunk)
-                current_chunk = overlap_sentences + [sentence]
-                current_tokens = self.count_tokens(' '.join(current_chunk))
-            else:
-                current_chunk.append(sentence)
-                current_tokens += sentence_tokens
-        
-        # Add final chunk
-        if current_chunk and self.count_tokens(' '.join(current_chunk)) >= CHUNK_MIN_SIZE:
-            chunks.append({
-                'text': ' '.join(current_chunk),
-                'metadata': metadata.copy()
-            })
-        
-        return chunks
+        return self.chunk_document_sections([{'text': text, 'metadata': metadata or {}}])
     
     def _split_sentences(self, text: str) -> List[str]:
         """Split text into sentences."""
-        import re
         # Simple sentence splitting
         sentences = re.split(r'(?<=[.!?])\s+', text)
         return [s.strip() for s in sentences if s.strip()]
     
-    def _get_overlap_sentences(self, sentences: List[str]) -> List[str]:
-        """Get sentences for overlap."""
-        overlap_text = ' '.join(sentences)
-        overlap_tokens = self.count_tokens(overlap_text)
+    def _build_units(self, sentences: List[str], sentence_tokens: List[int]) -> Tuple[List[str], List[int], List[bool]]:
+        """
+        Expand sentences into chunking units.
         
-        # Take sentences from the end until we reach overlap size
-        result = []
-        tokens = 0
+        Sentences longer than the chunk size are replaced by their words so
+        they can be split; every other sentence is a single unit.
         
-        for sentence in reversed(sentences):
-            sentence_tokens = self.count_tokens(sentence)
-            if tokens + sentence_tokens > self.overlap:
-                break
-            result.insert(0, sentence)
-            tokens += sentence_tokens
+        Returns:
+            Tuple of (unit texts, unit token counts, long-sentence start flags)
+        """
+        long_words = []
+        for sentence, tokens in zip(sentences, sentence_tokens):
+            if tokens > self.chunk_size:
+                long_words.extend(word + ' ' for word in sentence.split())
+        word_tokens = iter(self._count_tokens_batch(long_words))
+        
+        units, counts, starts_long = [], [], []
+        for sentence, tokens in zip(sentences, sentence_tokens):
+            if tokens > self.chunk_size:
+                for j, word in enumerate(sentence.split()):
+                    units.append(word)
+                    counts.append(next(word_tokens))
+                    starts_long.append(j == 0)
+            else:
+                units.append(sentence)
+                counts.append(tokens)
+                starts_long.append(False)
         
-        return result
+        return units, counts, starts_long
     
-    def _get_overlap_words(self, words: List[str]) -> List[str]:
-        """Get words for overlap."""
-        result = []
+    def _overlap_start(self, counts: List[int], start: int, end: int) -> int:
+        """Index of the first unit in the overlap carried over from units[start:end]."""
         tokens = 0
+        i = end
+        while i > start and tokens + counts[i - 1] <= self.overlap:
+            tokens += counts[i - 1]
+            i -= 1
+        return i
+    
+    def _chunk_units(self, units: List[str], counts: List[int], starts_long: List[bool], metadata: Dict) -> List[Dict]:
+        """
+        Build overlapping chunks from units using token offsets.
         
-        for word in reversed(words):
-            word_tokens = self.count_tokens(word + ' ')
-            if tokens + word_tokens > self.overlap:
-                break
-            result.insert(0, word)
-            tokens += word_tokens
+        The current chunk is always the unit range [start, i); its size is a
+        difference of prefix sums, so no text is re-encoded while chunking.
+        """
+        offsets = [0] + list(accumulate(counts))
+        chunks = []
         
-        return result
+        def emit(lo: int, hi: int):
+            chunks.append({
+                'text': ' '.join(units[lo:hi]),
+                'metadata': metadata.copy()
+            })
+        
+        start = 0
+        for i in range(len(units)):
+            current_tokens = offsets[i] - offsets[start]
+            
+            # First word of a long sentence: flush the current chunk without overlap
+            if starts_long[i]:
+                if i > start:
+                    emit(start, i)
+                start = i
+                continue
+            
+            # Adding this unit exceeds the chunk size: flush and carry the overlap
+            if current_tokens + counts[i] > self.chunk_size and i > start:
+                emit(start, i)
+                start = self._overlap_start(counts, start, i)
+        
+        # Add final chunk
+        if start < len(units) and offsets[len(units)] - offsets[start] >= CHUNK_MIN_SIZE:
+            emit(start, len(units))
+        
+        return chunks
     
     def chunk_document_sections(self, sections: List[Dict]) -> List[Dict]:
         """
         Chunk document sections while preserving section metadata.
         
+        Sentences from all sections are tokenized once, in a single batched
+        (multi-threaded) tiktoken call; chunks are then built from token
+        offsets.
+        
         Args:
             sections: List of section dicts from parser
             
         Returns:
             List of chunk dictionaries
         """
-        all_chunks = []
-        
+        section_sentences = []
         for section in sections:
             text = section.get('text', '')
-            metadata = section.get('metadata', {})
+            if not text or not text.strip():
+                section_sentences.append([])
+            else:
+                section_sentences.append(self._split_sentences(text))
+        
+        flat = [sentence for sentences in section_sentences for sentence in sentences]
+        flat_tokens = self._count_tokens_batch(flat)
+        
+        all_chunks = []
+        position = 0
+        for section, sentences in zip(sections, section_sentences):
+            sentence_tokens = flat_tokens[position:position + len(sentences)]
+            position += len(sentences)
+            if not sentences:
+                continue
             
-            chunks = self.chunk_text(text, metadata)
-            all_chunks.extend(chunks)
+            units, counts, starts_long = self._build_units(sentences, sentence_tokens)
+            all_chunks.extend(self._chunk_units(units, counts, starts_long, section.get('metadata', {}) or {}))
         
         return all_chunks
+    
+    def iter_chunks(self, sections: Iterable[Dict], group_size: int = 16) -> Iterator[Dict]:
+        """
+        Chunk a stream of sections, tokenizing them in small groups.
+        
+        Args:
+            sections: Iterable of section dicts (e.g. a streaming parser)
+            group_size: Number of sections tokenized per batch
+            
+        Yields:
+            Chunk dictionaries
+        """
+        group = []
+        for section in sections:
+            group.append(section)
+            if len(group) >= group_size:
+                yield from self.chunk_document_sections(group)
+                group = []
+        
+        if group:
+            yield from self.chunk_document_sections(group)
@@ -2,6 +2,7 @@
 Metadata extraction from filenames and document structure.
 """
 import re
+import hashlib
 from pathlib import Path
 from typing import Dict, Optional
 import uuid
@@ -87,6 +88,7 @@ class MetadataExtractor:
             'material_type': base_metadata.get('material_type', 'unknown'),
             'material_title': base_metadata.get('material_title', 'Unknown'),
             'material_file': base_metadata.get('material_file', ''),
+            'content_hash': MetadataExtractor.content_hash(chunk_text),
             'text': chunk_text[:200] + '...' if len(chunk_text) > 200 else chunk_text  # Preview
         }
         
@@ -110,6 +112,11 @@ class MetadataExtractor:
         
         return metadata
     
+    @staticmethod
+    def content_hash(chunk_text: str) -> str:
+        """Stable hash of chunk text, used to detect unchanged chunks on replace."""
+        return hashlib.sha256(chunk_text.encode('utf-8')).hexdigest()
+    
     @staticmethod
     def merge_metadata(base: Dict, additional: Dict) -> Dict:
         """Merge additional metadata into base metadata."""
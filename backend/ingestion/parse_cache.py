@@ -0,0 +1,118 @@
+"""
+On-disk cache of parser output keyed by file content hash.
+
+Parsed sections are stored as gzip-compressed JSON lines, one section per
+line, so cached documents stream back without loading the whole file.
+"""
+import gzip
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+import sys
+sys.path.append('..')
+from config import PARSE_CACHE_DIR, PARSE_CACHE_MAX_MB
+
+
+class ParseCache:
+    """Cache parsed sections by file hash, file type and parser version."""
+    
+    def __init__(self, cache_dir: Path = PARSE_CACHE_DIR, max_bytes: int = PARSE_CACHE_MAX_MB * 1024 * 1024):
+        """
+        Initialize cache.
+        
+        Args:
+            cache_dir: Directory holding cache entries
+            max_bytes: Total size above which least recently used entries are evicted
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+    
+    @staticmethod
+    def file_hash(file_path: str) -> str:
+        """SHA-256 of a file's bytes, read in blocks."""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def key_for(self, file_path: str, parser_version: str) -> str:
+        """Cache key for a file; the extension is included because it selects the parser."""
+        extension = Path(file_path).suffix.lower().lstrip('.')
+        return f"{self.file_hash(file_path)}-{extension}-v{parser_version}"
+    
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.jsonl.gz"
+    
+    def load(self, key: str) -> Optional[Iterator[Dict]]:
+        """
+        Return an iterator over cached sections, or None on a cache miss.
+        """
+        path = self._entry_path(key)
+        if not path.exists():
+            return None
+        
+        # Refresh mtime so eviction is least-recently-used
+        os.utime(path)
+        return self._read(path)
+    
+    @staticmethod
+    def _read(path: Path) -> Iterator[Dict]:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+    
+    def store(self, key: str, sections: Iterator[Dict]) -> Iterator[Dict]:
+        """
+        Pass sections through while writing them to the cache.
+        
+        The entry only becomes visible once the iterator is fully consumed;
+        a parse error or an abandoned iterator leaves no partial entry.
+        """
+        path = self._entry_path(key)
+        tmp_path = self.cache_dir / f".{key}.{uuid.uuid4().hex}.tmp"
+        completed = False
+        try:
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                for section in sections:
+                    f.write(json.dumps(section, separators=(',', ':')) + '\n')
+                    yield section
+            os.replace(tmp_path, path)
+            completed = True
+        finally:
+            if not completed and tmp_path.exists():
+                tmp_path.unlink()
+        
+        self.prune()
+    
+    def prune(self):
+        """Evict least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for path in self.cache_dir.glob('*.jsonl.gz'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+_parse_cache_instance = None
+
+
+def get_parse_cache() -> ParseCache:
+    """Get or create the global parse cache instance."""
+    global _parse_cache_instance
+    if _parse_cache_instance is None:
+        _parse_cache_instance = ParseCache()
+    return _parse_cache_instance
@@ -3,10 +3,53 @@ Document parsers for different file types.
 Extracts text while preserving structure (page numbers, sections, etc.).
 """
 import fitz  # PyMuPDF
-from docx import Document
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import xml.etree.ElementTree as ET
+import zipfile
 import re
+import sys
+sys.path.append('..')
+from config import (
+    PDF_PARALLEL_PAGE_THRESHOLD, PDF_PARSE_WORKERS, PDF_PAGES_PER_TASK,
+    PARSE_CACHE_ENABLED, PARSE_SECTION_MAX_CHARS
+)
+from .parse_cache import get_parse_cache
+
+# Bump when parser output changes so stale parse cache entries are ignored
+PARSER_VERSION = "3"
+
+# WordprocessingML namespace used in DOCX XML parts
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+def _section(name: str, text: str) -> Dict:
+    """Build a section dictionary."""
+    return {
+        'section': name,
+        'text': text,
+        'metadata': {'section': name}
+    }
+
+
+def _extract_page_texts(file_path: str, start: int, end: int) -> List[str]:
+    """
+    Extract plain text for a page range.
+    
+    Runs in a worker process, which opens the document independently.
+    """
+    doc = fitz.open(file_path)
+    try:
+        # Use "text" to get plain text, and replace common odd characters
+        return [
+            doc[page_num].get_text("text").encode("ascii", "ignore").decode("ascii").strip()
+            for page_num in range(start, end)
+        ]
+    finally:
+        doc.close()
 
 
 class PDFParser:
@@ -20,25 +63,71 @@ class PDFParser:
         Returns:
             List of dicts with 'page', 'text', 'metadata'
         """
+        return list(PDFParser.iter_pages(file_path))
+    
+    @staticmethod
+    def iter_pages(file_path: str) -> Iterator[Dict]:
+        """
+        Yield page dictionaries one at a time.
+        
+        Yields:
+            Dicts with 'page', 'text', 'metadata'
+        """
         doc = fitz.open(file_path)
-        pages = []
+        total_pages = len(doc)
         
+        if total_pages >= PDF_PARALLEL_PAGE_THRESHOLD and PDF_PARSE_WORKERS > 1:
+            doc.close()
+            texts = PDFParser._iter_page_texts_parallel(file_path, total_pages)
+        else:
+            texts = PDFParser._iter_page_texts_serial(doc)
+        
+        try:
+            for page_num, text in enumerate(texts):
+                yield {
+                    'page': page_num + 1,
+                    'text': text,
+                    'metadata': {
+                        'page': page_num + 1,
+                        'total_pages': total_pages
+                    }
+                }
+        finally:
+            if not doc.is_closed:
+                doc.close()
+    
+    @staticmethod
+    def _iter_page_texts_serial(doc) -> Iterator[str]:
+        """Yield page texts from an open document in the current process."""
         for page_num in range(len(doc)):
             page = doc[page_num]
             # Use "text" to get plain text, and replace common odd characters
-            text = page.get_text("text").encode("ascii", "ignore").decode("ascii")
-            
-            pages.append({
-                'page': page_num + 1,
-                'text': text.strip(),
-                'metadata': {
-                    'page': page_num + 1,
-                    'total_pages': len(doc)
-                }
-            })
+            yield page.get_text("text").encode("ascii", "ignore").decode("ascii").strip()
+    
+    @staticmethod
+    def _iter_page_texts_parallel(file_path: str, total_pages: int) -> Iterator[str]:
+        """
+        Yield page texts in order, extracting page ranges in worker processes.
         
-        doc.close()
-        return pages
+        At most two ranges per worker are in flight, so pages are streamed
+        back without buffering the whole document.
+        """
+        ranges = deque(
+            (start, min(start + PDF_PAGES_PER_TASK, total_pages))
+            for start in range(0, total_pages, PDF_PAGES_PER_TASK)
+        )
+        workers = min(PDF_PARSE_WORKERS, len(ranges))
+        print(f"Extracting {total_pages} pages with {workers} worker processes...")
+        
+        # Spawned workers avoid forking a process that may hold model threads
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            pending = deque()
+            while ranges or pending:
+                while ranges and len(pending) < workers * 2:
+                    start, end = ranges.popleft()
+                    pending.append(executor.submit(_extract_page_texts, file_path, start, end))
+                yield from pending.popleft().result()
 
 
 class DOCXParser:
@@ -52,45 +141,144 @@ class DOCXParser:
         Returns:
             List of dicts with 'section', 'text', 'metadata'
         """
-        doc = Document(file_path)
-        sections = []
+        return list(DOCXParser.iter_sections(file_path))
+    
+    @staticmethod
+    def iter_sections(file_path: str) -> Iterator[Dict]:
+        """
+        Stream sections out of a DOCX file.
+        
+        Body paragraphs are read incrementally from word/document.xml and
+        discarded once processed; a section is yielded as soon as the next
+        heading closes it (or it grows past PARSE_SECTION_MAX_CHARS).
+        
+        Yields:
+            Dicts with 'section', 'text', 'metadata'
+        """
         current_section = "Introduction"
         current_text = []
+        current_chars = 0
+        yielded = False
+        # Only kept until the first section is yielded, for the headings-only fallback
+        heading_lines = []
         
-        for para in doc.paragraphs:
-            text = para.text.strip()
+        for style_name, text in DOCXParser._iter_paragraphs(file_path):
+            text = text.strip()
             if not text:
                 continue
             
             # Detect headings (simple heuristic: short lines, possibly numbered)
-            if len(text) < 100 and (para.style.name.startswith('Heading') or 
+            if len(text) < 100 and (style_name.startswith('Heading') or
                                     re.match(r'^(\d+\.|\d+\)|\w+\.)\s+[A-Z]', text)):
                 # Save previous section
                 if current_text:
-                    sections.append({
-                        'section': current_section,
-                        'text': '\n'.join(current_text),
-                        'metadata': {
-                            'section': current_section
-                        }
-                    })
+                    yield _section(current_section, '\n'.join(current_text))
+                    yielded = True
                     current_text = []
+                    current_chars = 0
                 
+                if not yielded:
+                    heading_lines.append(text)
                 current_section = text
             else:
                 current_text.append(text)
+                current_chars += len(text) + 1
+                if current_chars >= PARSE_SECTION_MAX_CHARS:
+                    yield _section(current_section, '\n'.join(current_text))
+                    yielded = True
+                    current_text = []
+                    current_chars = 0
         
         # Add final section
         if current_text:
-            sections.append({
-                'section': current_section,
-                'text': '\n'.join(current_text),
-                'metadata': {
-                    'section': current_section
-                }
-            })
+            yield _section(current_section, '\n'.join(current_text))
+        elif not yielded:
+            yield {'section': 'Document', 'text': '\n'.join(heading_lines), 'metadata': {}}
+    
+    @staticmethod
+    def _load_style_names(archive: zipfile.ZipFile) -> Tuple[Dict[str, str], str]:
+        """
+        Map paragraph style IDs to display names (as python-docx reports them).
+        
+        Returns:
+            Tuple of (style ID -> name, default paragraph style name)
+        """
+        try:
+            root = ET.fromstring(archive.read('word/styles.xml'))
+        except KeyError:
+            return {}, 'Normal'
         
-        return sections if sections else [{'section': 'Document', 'text': '\n'.join([p.text for p in doc.paragraphs]), 'metadata': {}}]
+        names = {}
+        default = 'Normal'
+        for style in root.iter(f'{_W}style'):
+            if style.get(f'{_W}type') != 'paragraph':
+                continue
+            style_id = style.get(f'{_W}styleId')
+            name_el = style.find(f'{_W}name')
+            name = name_el.get(f'{_W}val') if name_el is not None else style_id
+            # Built-in heading styles are stored lowercase ("heading 1")
+            if name.startswith('heading '):
+                name = 'H' + name[1:]
+            names[style_id] = name
+            if style.get(f'{_W}default') in ('1', 'true'):
+                default = name
+        
+        return names, default
+    
+    @staticmethod
+    def _iter_paragraphs(file_path: str) -> Iterator[Tuple[str, str]]:
+        """Yield (style name, text) for each top-level body paragraph."""
+        with zipfile.ZipFile(file_path) as archive:
+            style_names, default_style = DOCXParser._load_style_names(archive)
+            
+            with archive.open('word/document.xml') as document_xml:
+                depth = 0
+                body = None
+                for event, elem in ET.iterparse(document_xml, events=('start', 'end')):
+                    if event == 'start':
+                        depth += 1
+                        if elem.tag == f'{_W}body':
+                            body = elem
+                        continue
+                    
+                    depth -= 1
+                    # Direct children of <w:body> sit at depth 2 once closed
+                    if depth != 2 or body is None:
+                        continue
+                    
+                    if elem.tag == f'{_W}p':
+                        style_el = elem.find(f'{_W}pPr/{_W}pStyle')
+                        style_id = style_el.get(f'{_W}val') if style_el is not None else None
+                        style_name = style_names.get(style_id, default_style) if style_id else default_style
+                        yield style_name, DOCXParser._paragraph_text(elem)
+                    
+                    # Drop processed body content so memory stays flat
+                    body.clear()
+    
+    @staticmethod
+    def _paragraph_text(paragraph) -> str:
+        """Text of a paragraph's runs, including runs inside hyperlinks."""
+        parts = []
+        for child in paragraph:
+            if child.tag == f'{_W}r':
+                runs = [child]
+            elif child.tag == f'{_W}hyperlink':
+                runs = child.findall(f'{_W}r')
+            else:
+                continue
+            
+            for run in runs:
+                for item in run:
+                    if item.tag == f'{_W}t':
+                        parts.append(item.text or '')
+                    elif item.tag in (f'{_W}tab', f'{_W}ptab'):
+                        parts.append('\t')
+                    elif item.tag == f'{_W}cr' or (
+                        item.tag == f'{_W}br' and item.get(f'{_W}type', 'textWrapping') == 'textWrapping'
+                    ):
+                        parts.append('\n')
+        
+        return ''.join(parts)
 
 
 class TextParser:
@@ -104,72 +292,144 @@ class TextParser:
         Returns:
             List of dicts with 'section', 'text', 'metadata'
         """
+        return list(TextParser.iter_sections(file_path))
+    
+    @staticmethod
+    def iter_sections(file_path: str) -> Iterator[Dict]:
+        """
+        Stream sections out of a text/markdown file, reading it line by line.
+        
+        Yields:
+            Dicts with 'section', 'text', 'metadata'
+        """
         with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+            lines = (line[:-1] if line.endswith('\n') else line for line in f)
+            
+            # Try to detect markdown sections
+            if file_path.endswith('.md'):
+                yield from TextParser._iter_markdown(lines)
+            else:
+                yield from TextParser._iter_plain(lines)
+    
+    @staticmethod
+    def _iter_plain(lines: Iterable[str]) -> Iterator[Dict]:
+        """Yield plain text as 'Document' sections of bounded size."""
+        current_text = []
+        current_chars = 0
+        yielded = False
         
-        # Try to detect markdown sections
-        if file_path.endswith('.md'):
-            return TextParser._parse_markdown(content)
-        else:
-            return [{'section': 'Document', 'text': content, 'metadata': {}}]
+        for line in lines:
+            current_text.append(line)
+            current_chars += len(line) + 1
+            if current_chars >= PARSE_SECTION_MAX_CHARS:
+                yield {'section': 'Document', 'text': '\n'.join(current_text), 'metadata': {}}
+                yielded = True
+                current_text = []
+                current_chars = 0
+        
+        if current_text or not yielded:
+            yield {'section': 'Document', 'text': '\n'.join(current_text), 'metadata': {}}
     
     @staticmethod
     def _parse_markdown(content: str) -> List[Dict]:
         """Parse markdown with section detection."""
-        sections = []
-        lines = content.split('\n')
+        return list(TextParser._iter_markdown(content.split('\n')))
+    
+    @staticmethod
+    def _iter_markdown(lines: Iterable[str]) -> Iterator[Dict]:
+        """Yield markdown sections as each heading closes the previous one."""
         current_section = "Introduction"
         current_text = []
+        current_chars = 0
+        yielded = False
+        # Only kept until the first section is yielded, for the headings-only fallback
+        heading_lines = []
         
         for line in lines:
             # Detect markdown headings
             if line.startswith('#'):
                 # Save previous section
                 if current_text:
-                    sections.append({
-                        'section': current_section,
-                        'text': '\n'.join(current_text),
-                        'metadata': {'section': current_section}
-                    })
+                    yield _section(current_section, '\n'.join(current_text))
+                    yielded = True
                     current_text = []
+                    current_chars = 0
                 
+                if not yielded:
+                    heading_lines.append(line)
                 current_section = line.lstrip('#').strip()
             else:
                 current_text.append(line)
+                current_chars += len(line) + 1
+                if current_chars >= PARSE_SECTION_MAX_CHARS:
+                    yield _section(current_section, '\n'.join(current_text))
+                    yielded = True
+                    current_text = []
+                    current_chars = 0
         
         # Add final section
         if current_text:
-            sections.append({
-                'section': current_section,
-                'text': '\n'.join(current_text),
-                'metadata': {'section': current_section}
-            })
-        
-        return sections if sections else [{'section': 'Document', 'text': content, 'metadata': {}}]
+            yield _section(current_section, '\n'.join(current_text))
+        elif not yielded:
+            yield {'section': 'Document', 'text': '\n'.join(heading_lines), 'metadata': {}}
 
 
 class DocumentParser:
     """Main parser that routes to appropriate parser based on file type."""
     
     @staticmethod
-    def parse(file_path: str) -> List[Dict]:
+    def parse(file_path: str, use_cache: bool = PARSE_CACHE_ENABLED) -> List[Dict]:
         """
         Parse document and return structured content.
         
         Args:
             file_path: Path to the document
+            use_cache: Serve unchanged files from the parse cache
             
         Returns:
             List of content dictionaries with text and metadata
         """
-        path = Path(file_path)
-        extension = path.suffix.lower()
+        return list(DocumentParser.iter_sections(file_path, use_cache=use_cache))
+    
+    @staticmethod
+    def iter_sections(file_path: str, use_cache: bool = PARSE_CACHE_ENABLED) -> Iterator[Dict]:
+        """
+        Parse document and yield content dictionaries as they are produced.
+        
+        Every format is streamed: PDF pages one at a time, DOCX and text
+        sections as soon as a heading closes them. Files whose bytes were parsed before (by
+        the same parser version) are read back from the parse cache.
+        
+        Args:
+            file_path: Path to the document
+            use_cache: Serve unchanged files from the parse cache
+            
+        Yields:
+            Content dictionaries with text and metadata
+        """
+        if not use_cache:
+            yield from DocumentParser._iter_uncached(file_path)
+            return
+        
+        cache = get_parse_cache()
+        key = cache.key_for(file_path, PARSER_VERSION)
+        cached = cache.load(key)
+        if cached is not None:
+            print(f"Using cached parse of {Path(file_path).name}")
+            yield from cached
+        else:
+            yield from cache.store(key, DocumentParser._iter_uncached(file_path))
+    
+    @staticmethod
+    def _iter_uncached(file_path: str) -> Iterator[Dict]:
+        """Route to the parser for the file type."""
+        extension = Path(file_path).suffix.lower()
         
         if extension == '.pdf':
-            return PDFParser.parse(file_path)
+            yield from PDFParser.iter_pages(file_path)
         elif extension == '.docx':
-            return DOCXParser.parse(file_path)
+            yield from DOCXParser.iter_sections(file_path)
         elif extension in ['.txt', '.md']:
-            return TextParser.parse(file_path)
+            yield from TextParser.iter_sections(file_path)
         else:
             raise ValueError(f"Unsupported file type: {extension}")
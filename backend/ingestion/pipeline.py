@@ -0,0 +1,227 @@
+"""
+Streaming ingestion pipeline: parse -> chunk -> embed -> index.
+
+Pages stream out of the parser and are chunked incrementally on a producer
+thread. Chunks are handed to the caller's thread in fixed-size micro-batches
+through a bounded queue, so parsing blocks when embedding falls behind and
+memory stays bounded regardless of document size. Each micro-batch is
+committed to the database and the vector store as soon as it is embedded,
+making a large document searchable while it is still being ingested.
+
+The index is published as one snapshot at the end. Until then the run keeps
+its batches' vectors (about 1.5 KB per chunk) staged, and adds them again if
+the active store is replaced in the meantime, e.g. by a snapshot another
+worker published. The index write lock is only held to commit a batch and
+to publish, never while parsing or embedding.
+"""
+import queue
+import threading
+import uuid
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+from sqlalchemy.orm import Session
+import sys
+sys.path.append('..')
+from config import INGEST_MICRO_BATCH_SIZE, INGEST_MAX_PENDING_BATCHES, INGEST_SECTION_GROUP_SIZE, SENTENCE_INDEX_ENABLED
+from db import crud
+from retrieval import get_vector_store, index_write_lock
+from verification.sentence_index import build_sentence_rows
+from .parsers import DocumentParser
+from .chunker import TextChunker
+from .metadata_extractor import MetadataExtractor
+
+
+class IngestionParseError(Exception):
+    """Raised when the source document cannot be parsed."""
+
+
+_DONE = object()
+
+
+class IngestionPipeline:
+    """Stream a document into the database and vector store in micro-batches."""
+    
+    def __init__(
+        self,
+        embedder,
+        micro_batch_size: int = INGEST_MICRO_BATCH_SIZE,
+        max_pending_batches: int = INGEST_MAX_PENDING_BATCHES,
+        section_group_size: int = INGEST_SECTION_GROUP_SIZE
+    ):
+        """
+        Initialize pipeline.
+        
+        Args:
+            embedder: Embedder used for chunk embeddings
+            micro_batch_size: Chunks embedded and committed per batch
+            max_pending_batches: Capacity of the queue between chunking and embedding
+            section_group_size: Sections tokenized together by the chunker
+        """
+        self.embedder = embedder
+        self.micro_batch_size = micro_batch_size
+        self.max_pending_batches = max_pending_batches
+        self.section_group_size = section_group_size
+        self._staged_ids: List[str] = []
+        self._staged_vectors: List[np.ndarray] = []
+        self._staged_store = None
+        self.chunker = TextChunker()
+    
+    @staticmethod
+    def _parsed_sections(file_path: str) -> Iterator[Dict]:
+        """Yield the parser's sections, raising parser failures as IngestionParseError."""
+        sections = DocumentParser.iter_sections(file_path)
+        while True:
+            try:
+                section = next(sections)
+            except StopIteration:
+                return
+            except Exception as e:
+                raise IngestionParseError(str(e)) from e
+            yield section
+    
+    def _iter_chunks(self, file_path: str, base_metadata: Dict) -> Iterator[Dict]:
+        """Yield chunks for a file, merging section metadata into the base metadata."""
+        sections = (
+            {
+                'text': section.get('text', ''),
+                'metadata': MetadataExtractor.merge_metadata(base_metadata, section.get('metadata', {}))
+            }
+            for section in self._parsed_sections(file_path)
+        )
+        return self.chunker.iter_chunks(sections, group_size=self.section_group_size)
+    
+    def _produce(self, file_path: str, base_metadata: Dict, batches: queue.Queue, stop: threading.Event):
+        """Producer thread: parse and chunk, putting micro-batches on the queue."""
+        def put(item) -> bool:
+            # Block while the queue is full (back-pressure), but notice cancellation
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        try:
+            batch = []
+            for chunk in self._iter_chunks(file_path, base_metadata):
+                batch.append(chunk)
+                if len(batch) >= self.micro_batch_size:
+                    if not put(batch):
+                        return
+                    batch = []
+            if batch and not put(batch):
+                return
+            put(_DONE)
+        except Exception as e:
+            # Parser failures arrive as IngestionParseError; chunking and
+            # metadata errors are passed on unchanged
+            put(e)
+    
+    def _live_store(self):
+        """
+        The active vector store, holding every batch this run has committed.
+        
+        Caller holds the index write lock. If the store was replaced since the
+        last batch (a snapshot published by another worker, a reindex swap or
+        a snapshot activation), staged vectors it lacks are added to it again.
+        """
+        store = get_vector_store()
+        if self._staged_ids and store is not self._staged_store:
+            present = set(store.chunk_ids)
+            missing = [i for i, chunk_id in enumerate(self._staged_ids) if chunk_id not in present]
+            if missing:
+                print(f"Active index was replaced during ingest; re-applying {len(missing)} unpublished vectors")
+                store.add_embeddings(np.vstack(self._staged_vectors)[missing], [self._staged_ids[i] for i in missing])
+        self._staged_store = store
+        return store
+    
+    def _commit_batch(self, db: Session, material_id: int, batch: List[Dict], first_index: int) -> List[str]:
+        """Embed one micro-batch and commit it to the database and vector store."""
+        embeddings = self.embedder.embed_batch([chunk['text'] for chunk in batch], show_progress=False)
+        
+        rows = []
+        for offset, chunk in enumerate(batch):
+            chunk_id = str(uuid.uuid4())
+            full_metadata = MetadataExtractor.create_chunk_metadata(chunk['metadata'], chunk['text'])
+            full_metadata['chunk_id'] = chunk_id
+            rows.append({
+                'chunk_id': chunk_id,
+                'material_id': material_id,
+                'embedding_id': first_index + offset,
+                'chunk_metadata': full_metadata,
+                'text': chunk['text']
+            })
+        
+        chunk_ids = [row['chunk_id'] for row in rows]
+        sentence_rows = None
+        if SENTENCE_INDEX_ENABLED:
+            sentence_rows = build_sentence_rows(self.embedder, [(row['chunk_id'], row['text']) for row in rows])
+        
+        # Commit to the database first so any vector found by /ask resolves to a
+        # chunk; the lock keeps a concurrent reindex swap from dropping the batch
+        with index_write_lock():
+            store = self._live_store()
+            crud.create_chunks(db, rows, sentence_rows)
+            store.add_embeddings(embeddings, chunk_ids)
+            self._staged_ids.extend(chunk_ids)
+            self._staged_vectors.append(embeddings)
+        return chunk_ids
+    
+    def run(self, db: Session, material_id: int, file_path: str, base_metadata: Dict) -> int:
+        """
+        Ingest a file for an existing material.
+        
+        Batches become searchable in this process as they are committed; the
+        index is published as one snapshot once the whole file is in.
+        
+        Args:
+            db: Database session
+            material_id: ID of the material the chunks belong to
+            file_path: Path to the document
+            base_metadata: Material-level metadata merged into every chunk
+        
+        Returns:
+            Number of chunks ingested
+        
+        Raises:
+            IngestionParseError: If the document could not be parsed
+            Exception: Any chunking, embedding, database or index error, unchanged
+        """
+        batches = queue.Queue(maxsize=self.max_pending_batches)
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._produce,
+            args=(file_path, base_metadata, batches, stop),
+            daemon=True
+        )
+        producer.start()
+        
+        self._staged_ids = []
+        self._staged_vectors = []
+        self._staged_store = None
+        total = 0
+        try:
+            while True:
+                item = batches.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                
+                self._commit_batch(db, material_id, item, total)
+                total += len(item)
+                crud.update_material_chunk_count(db, material_id, total)
+                print(f"Ingested {total} chunks...")
+            
+            if total:
+                with index_write_lock():
+                    self._live_store().save(db_high_water_mark=crud.get_chunk_high_water_mark(db))
+        finally:
+            stop.set()
+            producer.join()
+            self._staged_ids = []
+            self._staged_vectors = []
+            self._staged_store = None
+        
+        return total
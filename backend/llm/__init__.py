@@ -2,6 +2,8 @@
 from .openrouter_client import OpenRouterClient, get_llm_client
 from .prompts import SYSTEM_PROMPT, create_rag_prompt, extract_refusal_keywords
 from .formatter import AnswerFormatter
+from .rate_limiter import LLMRateLimiter, LLMRateLimited, get_llm_rate_limiter, split_llm_budget
+from .latency import LatencyTracker, get_latency_tracker
 
 # Backward compatibility alias
 get_ollama_client = get_llm_client
@@ -13,5 +15,11 @@ __all__ = [
     "SYSTEM_PROMPT", 
     "create_rag_prompt", 
     "extract_refusal_keywords",
-    "AnswerFormatter"
+    "AnswerFormatter",
+    "LLMRateLimiter",
+    "LLMRateLimited",
+    "get_llm_rate_limiter",
+    "split_llm_budget",
+    "LatencyTracker",
+    "get_latency_tracker"
 ]
@@ -0,0 +1,104 @@
+"""
+Per-model LLM latency tracking for hedged requests.
+
+Recent successful call latencies are kept per model. A model's hedge delay
+is the LLM_HEDGE_PERCENTILE of its recent latencies: a call still running
+after that long is slower than most, so a request to the next model in the
+fallback chain is fired alongside it.
+"""
+import threading
+from collections import deque
+from typing import Dict
+import sys
+sys.path.append('..')
+from config import (
+    LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_SAMPLES, LLM_HEDGE_DEFAULT_DELAY_SECONDS, LLM_HEDGE_MIN_DELAY_SECONDS
+)
+
+
+def _percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty collection."""
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class LatencyTracker:
+    """Sliding window of call latencies and outcome counters per model."""
+    
+    def __init__(self, window: int = 200):
+        """
+        Initialize tracker.
+        
+        Args:
+            window: Recent latencies kept per model
+        """
+        self.window = window
+        self._latencies: Dict[str, deque] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+    
+    def _model_counters(self, model: str) -> Dict[str, int]:
+        """Counters of one model (caller holds the lock)."""
+        if model not in self._counters:
+            self._counters[model] = {'successes': 0, 'failures': 0, 'hedges_fired': 0, 'wins': 0}
+            self._latencies[model] = deque(maxlen=self.window)
+        return self._counters[model]
+    
+    def record(self, model: str, seconds: float):
+        """Record the latency of a successful call."""
+        with self._lock:
+            self._model_counters(model)['successes'] += 1
+            self._latencies[model].append(seconds)
+    
+    def count(self, model: str, event: str):
+        """Increment a counter: failures, hedges_fired (for the model hedged to) or wins."""
+        with self._lock:
+            self._model_counters(model)[event] += 1
+    
+    def hedge_delay(self, model: str) -> float:
+        """
+        How long to wait for a model before hedging to the next one.
+        
+        Args:
+            model: Model name
+        
+        Returns:
+            Seconds; LLM_HEDGE_DEFAULT_DELAY_SECONDS until enough samples exist
+        """
+        with self._lock:
+            latencies = self._latencies.get(model)
+            if not latencies or len(latencies) < LLM_HEDGE_MIN_SAMPLES:
+                return LLM_HEDGE_DEFAULT_DELAY_SECONDS
+            return max(_percentile(latencies, LLM_HEDGE_PERCENTILE), LLM_HEDGE_MIN_DELAY_SECONDS)
+    
+    def get_stats(self) -> Dict[str, Dict]:
+        """Latency percentiles, hedge delay and counters per model."""
+        with self._lock:
+            models = list(self._counters)
+        stats = {}
+        for model in models:
+            with self._lock:
+                latencies = list(self._latencies[model])
+                counters = dict(self._counters[model])
+            stats[model] = {
+                **counters,
+                'samples': len(latencies),
+                'p50_seconds': round(_percentile(latencies, 0.5), 3) if latencies else None,
+                'p95_seconds': round(_percentile(latencies, 0.95), 3) if latencies else None,
+                'hedge_delay_seconds': round(self.hedge_delay(model), 3)
+            }
+        return stats
+
+
+_latency_tracker = None
+_latency_tracker_lock = threading.Lock()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """Get or create the global latency tracker instance."""
+    global _latency_tracker
+    if _latency_tracker is None:
+        with _latency_tracker_lock:
+            if _latency_tracker is None:
+                _latency_tracker = LatencyTracker()
+    return _latency_tracker
@@ -2,11 +2,19 @@
 OpenRouter LLM client for high-performance cloud models.
 Replaces Ollama with OpenRouter API for better performance.
 """
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import requests
 from typing import Optional
 import sys
 sys.path.append('..')
-from config import OPENROUTER_API_KEY, OPENROUTER_BASE_URL, OPENROUTER_MODEL, LLM_TEMPERATURE, LLM_MAX_TOKENS
+from config import (
+    OPENROUTER_API_KEY, OPENROUTER_BASE_URL, OPENROUTER_MODEL, LLM_TEMPERATURE, LLM_MAX_TOKENS,
+    LLM_TIMEOUT_SECONDS, LLM_RATE_LIMIT_RETRIES, OPENROUTER_FALLBACK_MODELS, LLM_HEDGING_ENABLED,
+    LLM_MAX_CONCURRENT
+)
+from .rate_limiter import get_llm_rate_limiter
+from .latency import get_latency_tracker
 
 
 class OpenRouterClient:
@@ -17,7 +25,8 @@ class OpenRouterClient:
         api_key: str = OPENROUTER_API_KEY,
         base_url: str = OPENROUTER_BASE_URL,
         model: str = OPENROUTER_MODEL,
-        temperature: float = LLM_TEMPERATURE
+        temperature: float = LLM_TEMPERATURE,
+        fallback_models: Optional[list] = None
     ):
         """
         Initialize OpenRouter client.
@@ -27,11 +36,16 @@ class OpenRouterClient:
             base_url: OpenRouter API base URL
             model: Model name (e.g., "anthropic/claude-3.5-sonnet")
             temperature: Sampling temperature
+            fallback_models: Models tried after the primary, in order (defaults to OPENROUTER_FALLBACK_MODELS)
         """
         self.api_key = api_key
         self.base_url = base_url
         self.model = model
         self.temperature = temperature
+        fallbacks = OPENROUTER_FALLBACK_MODELS if fallback_models is None else fallback_models
+        self.models = [model] + [m for m in dict.fromkeys(fallbacks) if m != model]
+        # Runs hedged calls; a losing call cannot be aborted mid-request, so it finishes here
+        self._executor = ThreadPoolExecutor(max_workers=2 * LLM_MAX_CONCURRENT, thread_name_prefix="llm")
         
         # Debug print masked key
         masked_key = f"{api_key[:10]}...{api_key[-5:]}" if api_key else "None"
@@ -48,15 +62,24 @@ class OpenRouterClient:
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
-        max_tokens: int = LLM_MAX_TOKENS
+        max_tokens: int = LLM_MAX_TOKENS,
+        timeout: float = LLM_TIMEOUT_SECONDS
     ) -> str:
         """
         Generate response from LLM via OpenRouter.
         
+        With fallback models configured and hedging enabled, a call that is
+        still running after its model's adaptive hedge delay (recent p95
+        latency) is raced against the next model in the chain, and the first
+        successful answer wins. A model that fails hands over immediately.
+        With hedging disabled the fallback models are only tried in turn after
+        a failure, within the same timeout.
+        
         Args:
             prompt: User prompt
             system_prompt: System prompt for instructions
             max_tokens: Maximum tokens to generate
+            timeout: Overall timeout in seconds, including time queued in the rate limiter
             
         Returns:
             Generated text
@@ -74,31 +97,142 @@ class OpenRouterClient:
             'content': prompt
         })
         
-        try:
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=self.headers,
-                json={
-                    "model": self.model,
-                    "messages": messages,
-                    "temperature": self.temperature,
-                    "max_tokens": max_tokens
-                },
-                timeout=60  # 60 second timeout
-            )
+        started = time.monotonic()
+        deadline = started + timeout
+        if len(self.models) == 1:
+            return self._call_model(self.model, messages, max_tokens, deadline)
+        if not LLM_HEDGING_ENABLED:
+            return self._generate_sequential(messages, max_tokens, deadline)
+        
+        tracker = get_latency_tracker()
+        pending = {}
+        errors = []
+        launched = 0
+        
+        def launch():
+            nonlocal launched
+            model = self.models[launched]
+            launched += 1
+            pending[self._executor.submit(self._call_model, model, messages, max_tokens, deadline)] = model
+            return time.monotonic() + tracker.hedge_delay(model)
+        
+        hedge_at = launch()
+        while pending:
+            now = time.monotonic()
+            wait_until = min(hedge_at, deadline) if launched < len(self.models) else deadline
+            done, _ = wait(list(pending), timeout=max(wait_until - now, 0.0), return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                model = pending.pop(future)
+                if future.exception() is None:
+                    tracker.count(model, 'wins')
+                    if model != self.model:
+                        print(f"LLM answer served by fallback model {model}")
+                    # Slower calls still running finish in the background and feed the latency stats
+                    return future.result()
+                errors.append(future.exception())
+            
+            if time.monotonic() >= deadline:
+                break
+            if launched < len(self.models) and (not pending or time.monotonic() >= hedge_at):
+                if pending:
+                    print(f"Hedging LLM request to {self.models[launched]} after {time.monotonic() - started:.1f}s")
+                tracker.count(self.models[launched], 'hedges_fired')
+                hedge_at = launch()
+        
+        if errors and not pending:
+            raise errors[0]
+        raise requests.exceptions.Timeout(f"OpenRouter: no model answered within {timeout:.1f}s")
+    
+    def _generate_sequential(self, messages: list, max_tokens: int, deadline: float) -> str:
+        """
+        Try the models in order, moving to the next only when one fails.
+        
+        Args:
+            messages: Chat messages
+            max_tokens: Maximum tokens to generate
+            deadline: Monotonic time by which an answer is needed
             
-            response.raise_for_status()
-            data = response.json()
+        Returns:
+            Generated text
+        """
+        errors = []
+        for model in self.models:
+            if errors and time.monotonic() >= deadline:
+                break
+            try:
+                answer = self._call_model(model, messages, max_tokens, deadline)
+            except Exception as e:
+                errors.append(e)
+                continue
+            if model != self.model:
+                print(f"LLM answer served by fallback model {model}")
+            return answer
+        raise errors[0]
+    
+    def _call_model(self, model: str, messages: list, max_tokens: int, deadline: float) -> str:
+        """
+        Call one model through the shared rate limiter.
+        
+        Args:
+            model: OpenRouter model name
+            messages: Chat messages
+            max_tokens: Maximum tokens to generate
+            deadline: Monotonic time by which the call must finish
             
-            return data['choices'][0]['message']['content']
+        Returns:
+            Generated text
+        """
+        limiter = get_llm_rate_limiter()
+        tracker = get_latency_tracker()
+        # Rough prompt size (~4 characters per token) plus the completion budget
+        estimated_tokens = sum(len(m['content']) for m in messages) // 4 + max_tokens
+        
+        try:
+            for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+                reserved = limiter.acquire(estimated_tokens, deadline - time.monotonic())
+                used = None
+                try:
+                    started = time.monotonic()
+                    response = requests.post(
+                        f"{self.base_url}/chat/completions",
+                        headers=self.headers,
+                        json={
+                            "model": model,
+                            "messages": messages,
+                            "temperature": self.temperature,
+                            "max_tokens": max_tokens
+                        },
+                        timeout=max(deadline - time.monotonic(), 1.0)
+                    )
+                    
+                    if response.status_code == 429:
+                        # Everyone waits for the provider's reset; this call queues again
+                        used = 0
+                        limiter.on_rate_limited(response.headers)
+                        if attempt < LLM_RATE_LIMIT_RETRIES:
+                            continue
+                    
+                    response.raise_for_status()
+                    limiter.update_from_headers(response.headers)
+                    data = response.json()
+                    used = (data.get('usage') or {}).get('total_tokens')
+                    answer = data['choices'][0]['message']['content']
+                    tracker.record(model, time.monotonic() - started)
+                    
+                    return answer
+                finally:
+                    limiter.release(reserved, used)
         
         except requests.exceptions.RequestException as e:
-            print(f"Error calling OpenRouter API: {e}")
+            tracker.count(model, 'failures')
+            print(f"Error calling OpenRouter API ({model}): {e}")
             if hasattr(e, 'response') and e.response is not None:
                 print(f"Response: {e.response.text}")
             raise
         except (KeyError, IndexError) as e:
-            print(f"Error parsing OpenRouter response: {e}")
+            tracker.count(model, 'failures')
+            print(f"Error parsing OpenRouter response ({model}): {e}")
             raise
     
     def check_availability(self) -> bool:
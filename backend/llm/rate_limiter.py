@@ -0,0 +1,261 @@
+"""
+Client-side rate limiting of LLM calls.
+
+All OpenRouter calls in a process go through one limiter: a cap on calls in
+flight plus token buckets for requests and tokens per minute. Pre-forked
+workers each limit themselves to an equal share of the configured budgets,
+so together they stay within the provider account's limits. Callers are
+served in arrival order. Rate-limit headers on responses lower the local
+budget to what the provider reports, and a 429 pauses everyone until the
+provider's reset time and backs the request rate off, recovering gradually
+as calls succeed.
+"""
+import threading
+import time
+from typing import Dict, Mapping, Optional
+import sys
+sys.path.append('..')
+from config import (
+    LLM_MAX_CONCURRENT, LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_RATE_LIMIT_BACKOFF_SECONDS
+)
+
+
+class LLMRateLimited(Exception):
+    """Raised when an LLM call cannot start within its timeout."""
+
+
+def _header(headers: Mapping, *names: str) -> Optional[float]:
+    """First of the named headers that parses as a number."""
+    for name in names:
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return float(value)
+        except ValueError:
+            continue
+    return None
+
+
+class LLMRateLimiter:
+    """Concurrency cap plus request and token buckets, adapted from provider headers."""
+    
+    def __init__(
+        self,
+        max_concurrent: int = LLM_MAX_CONCURRENT,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = LLM_TOKENS_PER_MINUTE
+    ):
+        """
+        Initialize limiter.
+        
+        Args:
+            max_concurrent: LLM calls allowed in flight at once
+            requests_per_minute: Request budget (upper bound; 429s lower it temporarily)
+            tokens_per_minute: Token budget (prompt plus completion)
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.configured_rpm = float(requests_per_minute)
+        self.requests_per_minute = float(requests_per_minute)
+        self.tokens_per_minute = float(tokens_per_minute)
+        self._requests = self.requests_per_minute
+        self._tokens = self.tokens_per_minute
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._waiting = 0
+        self._next_ticket = 0
+        self._serving_ticket = 0
+        self._abandoned = set()
+        self._cond = threading.Condition()
+        self.stats = {
+            'calls': 0, 'throttled': 0, 'timeouts': 0, 'rate_limited_responses': 0,
+            'wait_seconds': 0.0, 'tokens_used': 0
+        }
+    
+    def _refill(self):
+        """Add the budget accrued since the last refill (caller holds the lock)."""
+        now = time.monotonic()
+        elapsed = now - self._refilled
+        self._refilled = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+    
+    def _delay(self, tokens: float) -> float:
+        """Seconds until a call needing tokens can start; 0 if it can start now (caller holds the lock)."""
+        self._refill()
+        delays = [self._paused_until - time.monotonic(), 0.0]
+        if self._requests < 1:
+            delays.append((1 - self._requests) * 60 / self.requests_per_minute)
+        if self._tokens < tokens:
+            delays.append((tokens - self._tokens) * 60 / self.tokens_per_minute)
+        return max(delays)
+    
+    def _advance(self):
+        """Pass the head of the line to the next live ticket (caller holds the lock)."""
+        self._serving_ticket += 1
+        while self._serving_ticket in self._abandoned:
+            self._abandoned.discard(self._serving_ticket)
+            self._serving_ticket += 1
+    
+    def acquire(self, tokens: int, timeout: float) -> float:
+        """
+        Wait in line for a call slot and budget for an estimated number of tokens.
+        
+        Args:
+            tokens: Estimated prompt plus completion tokens of the call
+            timeout: Longest to wait, in seconds
+        
+        Returns:
+            Tokens reserved (pass to release)
+        
+        Raises:
+            LLMRateLimited: If the call cannot start within timeout
+        """
+        tokens = min(float(tokens), self.tokens_per_minute)
+        arrived = time.monotonic()
+        deadline = arrived + timeout
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._waiting += 1
+            try:
+                while True:
+                    delay = None
+                    if self._serving_ticket == ticket and self._in_flight < self.max_concurrent:
+                        delay = self._delay(tokens)
+                        if delay <= 0:
+                            break
+                    remaining = deadline - time.monotonic()
+                    # Fail fast when the budget is known not to free up in time
+                    if remaining <= 0 or (delay is not None and delay > remaining):
+                        self.stats['timeouts'] += 1
+                        raise LLMRateLimited(
+                            f"OpenRouter rate limit: no LLM capacity within {timeout:.1f}s "
+                            f"({self._in_flight} calls in flight, {self._waiting - 1} waiting)"
+                        )
+                    self._cond.wait(remaining if delay is None else delay)
+            finally:
+                self._waiting -= 1
+                if self._serving_ticket == ticket:
+                    self._advance()
+                else:
+                    self._abandoned.add(ticket)
+                self._cond.notify_all()
+            
+            self._requests -= 1
+            self._tokens -= tokens
+            self._in_flight += 1
+            waited = time.monotonic() - arrived
+            self.stats['calls'] += 1
+            self.stats['wait_seconds'] += waited
+            if waited > 0.01:
+                self.stats['throttled'] += 1
+        return tokens
+    
+    def release(self, reserved: float, used: Optional[int] = None):
+        """
+        Finish a call, settling the token reservation against actual usage.
+        
+        Args:
+            reserved: Tokens returned by acquire
+            used: Tokens the provider reported (None keeps the estimate)
+        """
+        with self._cond:
+            self._in_flight -= 1
+            if used is not None:
+                self._tokens += reserved - used
+            self.stats['tokens_used'] += int(reserved if used is None else used)
+            self._cond.notify_all()
+    
+    def update_from_headers(self, headers: Mapping):
+        """
+        Lower the local budget to what the provider's rate-limit headers report.
+        
+        Args:
+            headers: Response headers (case-insensitive mapping)
+        """
+        remaining_requests = _header(headers, 'x-ratelimit-remaining-requests', 'x-ratelimit-remaining')
+        remaining_tokens = _header(headers, 'x-ratelimit-remaining-tokens')
+        with self._cond:
+            self._refill()
+            if remaining_requests is not None:
+                self._requests = min(self._requests, remaining_requests)
+            if remaining_tokens is not None:
+                self._tokens = min(self._tokens, remaining_tokens)
+            # Recover from earlier backoff one request/minute per successful call
+            self.requests_per_minute = min(self.configured_rpm, self.requests_per_minute + 1)
+    
+    def on_rate_limited(self, headers: Mapping):
+        """
+        Pause all calls after a 429 and back the request rate off.
+        
+        Args:
+            headers: Headers of the 429 response
+        """
+        retry_after = _header(headers, 'retry-after')
+        reset = _header(headers, 'x-ratelimit-reset')
+        if retry_after is None and reset is not None:
+            # OpenRouter reports the reset time in epoch milliseconds
+            retry_after = reset / 1000 - time.time()
+        if retry_after is None or retry_after <= 0:
+            retry_after = LLM_RATE_LIMIT_BACKOFF_SECONDS
+        
+        with self._cond:
+            self._refill()
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            self._requests = min(self._requests, 0.0)
+            self.requests_per_minute = max(1.0, self.requests_per_minute * 0.75)
+            self.stats['rate_limited_responses'] += 1
+            self._cond.notify_all()
+        print(f"OpenRouter rate limited; pausing LLM calls for {retry_after:.1f}s "
+              f"(request budget now {self.requests_per_minute:.0f}/min)")
+    
+    def get_stats(self) -> Dict:
+        """Current utilization and counters."""
+        with self._cond:
+            self._refill()
+            return {
+                **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.stats.items()},
+                'in_flight': self._in_flight,
+                'waiting': self._waiting,
+                'concurrency_utilization': round(self._in_flight / self.max_concurrent, 3),
+                'requests_per_minute': round(self.requests_per_minute, 1),
+                'request_budget_utilization': round(1 - max(self._requests, 0.0) / self.requests_per_minute, 3),
+                'token_budget_utilization': round(1 - max(self._tokens, 0.0) / self.tokens_per_minute, 3),
+                'paused_seconds': round(max(self._paused_until - time.monotonic(), 0.0), 3)
+            }
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_llm_rate_limiter() -> LLMRateLimiter:
+    """Get or create the global LLM rate limiter instance."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = LLMRateLimiter()
+    return _rate_limiter
+
+
+def split_llm_budget(workers: int):
+    """
+    Limit this process to its share of the LLM budgets.
+    
+    Called in each pre-forked worker before it serves requests, so the
+    workers together stay within the configured (account-wide) limits.
+    
+    Args:
+        workers: Number of worker processes sharing the budgets
+    """
+    global _rate_limiter
+    workers = max(1, workers)
+    with _rate_limiter_lock:
+        _rate_limiter = LLMRateLimiter(
+            max_concurrent=max(1, LLM_MAX_CONCURRENT // workers),
+            requests_per_minute=LLM_REQUESTS_PER_MINUTE / workers,
+            tokens_per_minute=LLM_TOKENS_PER_MINUTE / workers
+        )
@@ -1,11 +1,15 @@
 """Main entry point for the backend application."""
 import uvicorn
-from api.main import app
+from config import API_HOST, API_PORT, PREFORK_WORKERS
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "api.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True
-    )
+    if PREFORK_WORKERS > 1:
+        from api.prefork import serve_prefork
+        serve_prefork(PREFORK_WORKERS, API_HOST, API_PORT)
+    else:
+        uvicorn.run(
+            "api.main:app",
+            host=API_HOST,
+            port=API_PORT,
+            reload=True
+        )
@@ -1,12 +1,14 @@
 """Retrieval package initialization."""
 from .embedder import Embedder, get_embedder
-from .vector_store import VectorStore, get_vector_store
+from .vector_store import VectorStore, get_vector_store, peek_vector_store, swap_vector_store, index_write_lock
 from .filters import MetadataFilter
 from .reranker import Reranker, get_reranker
+from .model_registry import get_sentence_transformer, get_cross_encoder
 
 __all__ = [
     "Embedder", "get_embedder",
-    "VectorStore", "get_vector_store",
+    "VectorStore", "get_vector_store", "peek_vector_store", "swap_vector_store", "index_write_lock",
     "MetadataFilter",
-    "Reranker", "get_reranker"
+    "Reranker", "get_reranker",
+    "get_sentence_transformer", "get_cross_encoder"
 ]
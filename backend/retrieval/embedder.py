@@ -1,12 +1,14 @@
 """
 Embedding generation using SentenceTransformers.
 """
-from sentence_transformers import SentenceTransformer
 import numpy as np
 from typing import List
 import sys
 sys.path.append('..')
-from config import EMBEDDING_MODEL, BATCH_SIZE
+from config import EMBEDDING_MODEL
+from .model_registry import get_sentence_transformer
+from . import inference
+from .scheduler import get_model_scheduler
 
 
 class Embedder:
@@ -19,8 +21,8 @@ class Embedder:
         Args:
             model_name: Name of the SentenceTransformers model
         """
-        print(f"Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self.model = get_sentence_transformer(model_name)
         self.dimension = self.model.get_sentence_embedding_dimension()
         print(f"Model loaded. Embedding dimension: {self.dimension}")
     
@@ -34,28 +36,82 @@ class Embedder:
         Returns:
             Normalized embedding vector
         """
-        embedding = self.model.encode(text, convert_to_numpy=True)
+        # Batched with concurrent queries by the inference scheduler
+        embedding = inference.encode(self.model_name, [text])[0]
         # L2 normalization for cosine similarity
         embedding = embedding / np.linalg.norm(embedding)
         return embedding
     
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        """Token count of each text as the model will see it (after truncation)."""
+        max_length = getattr(self.model, 'max_seq_length', None) or 512
+        try:
+            encoded = self.model.tokenizer(
+                texts, add_special_tokens=True, truncation=True, max_length=max_length
+            )['input_ids']
+            return [len(ids) for ids in encoded]
+        except Exception:
+            # A rough estimate is enough for bucketing if the tokenizer is unavailable
+            return [min(len(text.split()) * 4 // 3 + 2, max_length) for text in texts]
+    
+    @staticmethod
+    def _length_buckets(lengths: List[int], token_budget: int) -> List[List[int]]:
+        """
+        Group text indices into batches of similar length.
+        
+        Indices are sorted by token length and cut into batches whose padded
+        size (batch length x longest member) stays within token_budget, so
+        short texts go in large batches and long texts in small ones.
+        """
+        batches = []
+        current = []
+        for i in sorted(range(len(lengths)), key=lengths.__getitem__):
+            # Sorted ascending, so the newest member is the longest
+            if current and (len(current) + 1) * lengths[i] > token_budget:
+                batches.append(current)
+                current = []
+            current.append(i)
+        if current:
+            batches.append(current)
+        return batches
+    
     def embed_batch(self, texts: List[str], show_progress: bool = True) -> np.ndarray:
         """
         Generate embeddings for a batch of texts.
         
+        This is the bulk path (ingestion, reindexing): texts are bucketed by
+        token length into batches sized by a padded-token budget, and each
+        batch runs as one slice at bulk priority, so interactive queries get
+        the model between slices. Embeddings are returned in input order.
+        
         Args:
             texts: List of texts to embed
-            show_progress: Whether to show progress bar
+            show_progress: Whether to print progress
             
         Returns:
             Array of normalized embeddings
         """
-        embeddings = self.model.encode(
-            texts,
-            batch_size=BATCH_SIZE,
-            show_progress_bar=show_progress,
-            convert_to_numpy=True
-        )
+        if not texts:
+            return np.zeros((0, self.dimension), dtype='float32')
+        
+        scheduler = get_model_scheduler()
+        buckets = self._length_buckets(self._token_lengths(texts), scheduler.bulk_slice_tokens)
+        embeddings = np.empty((len(texts), self.dimension), dtype='float32')
+        embedded = 0
+        next_report = 0.1
+        for bucket in buckets:
+            with scheduler.bulk_slice():
+                embeddings[bucket] = self.model.encode(
+                    [texts[i] for i in bucket],
+                    batch_size=len(bucket),
+                    show_progress_bar=False,
+                    convert_to_numpy=True
+                )
+            embedded += len(bucket)
+            done = embedded / len(texts)
+            if show_progress and done >= next_report:
+                print(f"Embedded {int(done * 100)}% of {len(texts)} texts")
+                next_report = done + 0.1
         
         # L2 normalization for cosine similarity
         norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
@@ -0,0 +1,162 @@
+"""
+Multi-process embedding for large bulk jobs.
+
+Texts are processed in windows of EMBED_POOL_WINDOW_SIZE. Inside a window
+they are bucketed by token length into model batches sized by a padded-token
+budget, the same way the in-process embedder does, so little compute goes
+to padding. Batches are grouped into tasks that run in worker processes,
+each loading its own copy of the model. Windows complete in input order,
+so callers can consume results as a stream while the next window is
+already being encoded.
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import time
+from typing import Iterator, List
+import numpy as np
+import sys
+sys.path.append('..')
+from config import (
+    EMBEDDING_MODEL, EMBEDDING_DIMENSION, EMBED_POOL_WORKERS, EMBED_POOL_MIN_TEXTS,
+    EMBED_POOL_TASK_SIZE, EMBED_POOL_WINDOW_SIZE, EMBED_POOL_NICE, BULK_SLICE_TOKENS, INFERENCE_BACKEND
+)
+from .embedder import Embedder, get_embedder
+
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int, nice: int):
+    """Load the model once per worker process, limited to its share of the cores."""
+    global _worker_model
+    if nice and hasattr(os, 'nice'):
+        os.nice(nice)
+    if INFERENCE_BACKEND == "onnx":
+        from retrieval.onnx_backend import set_intra_op_threads
+        set_intra_op_threads(threads)
+    from retrieval.model_registry import get_sentence_transformer
+    _worker_model = get_sentence_transformer(model_name)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+
+def _encode_task(batches: List[List[str]]) -> np.ndarray:
+    """Encode one task's length-bucketed batches in a worker process, each as one model batch."""
+    return np.vstack([
+        np.asarray(_worker_model.encode(batch, batch_size=len(batch), convert_to_numpy=True), dtype=np.float32)
+        for batch in batches
+    ])
+
+
+class EmbeddingPool:
+    """Pool of worker processes, each with its own embedding model."""
+    
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL,
+        workers: int = EMBED_POOL_WORKERS,
+        task_size: int = EMBED_POOL_TASK_SIZE,
+        window_size: int = EMBED_POOL_WINDOW_SIZE,
+        batch_tokens: int = BULK_SLICE_TOKENS
+    ):
+        """
+        Initialize pool.
+        
+        Args:
+            model_name: Name of the SentenceTransformers model
+            workers: Number of worker processes
+            task_size: Texts per worker task
+            window_size: Texts sorted and returned together
+            batch_tokens: Padded tokens per model batch
+        """
+        self.model_name = model_name
+        self.workers = max(1, workers)
+        self.task_size = task_size
+        self.window_size = window_size
+        self.batch_tokens = batch_tokens
+        self.executor = None
+        self.texts_per_second = 0.0
+    
+    def __enter__(self):
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_name, threads, EMBED_POOL_NICE)
+        )
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.executor.shutdown(cancel_futures=exc_type is not None)
+        self.executor = None
+    
+    def _submit_window(self, window: List[str]):
+        """Bucket a window by token length and submit its batches as tasks of about task_size texts."""
+        embedder = get_embedder()
+        batches = Embedder._length_buckets(embedder._token_lengths(window), self.batch_tokens)
+        
+        task_batches = []
+        current = []
+        current_size = 0
+        for batch in batches:
+            if current and current_size + len(batch) > self.task_size:
+                task_batches.append(current)
+                current = []
+                current_size = 0
+            current.append(batch)
+            current_size += len(batch)
+        if current:
+            task_batches.append(current)
+        
+        tasks = [[i for batch in task for i in batch] for task in task_batches]
+        futures = [
+            self.executor.submit(_encode_task, [[window[i] for i in batch] for batch in task])
+            for task in task_batches
+        ]
+        return len(window), tasks, futures
+    
+    def iter_embeddings(self, texts: List[str]) -> Iterator[np.ndarray]:
+        """
+        Embed texts, yielding normalized embeddings window by window in input order.
+        
+        Args:
+            texts: Texts to embed
+        
+        Yields:
+            Arrays of normalized embeddings for consecutive windows of texts
+        """
+        started = time.monotonic()
+        done = 0
+        windows = deque(range(0, len(texts), self.window_size))
+        pending = deque()
+        while windows or pending:
+            # Keep the next window queued so workers never idle on a window's tail
+            while windows and len(pending) < 2:
+                start = windows.popleft()
+                pending.append(self._submit_window(texts[start:start + self.window_size]))
+            
+            size, tasks, futures = pending.popleft()
+            parts = [future.result() for future in futures]
+            embeddings = np.empty((size, parts[0].shape[1]), dtype=np.float32)
+            for task, part in zip(tasks, parts):
+                embeddings[task] = part
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+            
+            done += size
+            self.texts_per_second = done / max(time.monotonic() - started, 1e-9)
+            print(f"Embedded {done}/{len(texts)} texts ({self.texts_per_second:.0f} chunks/sec, {self.workers} workers)")
+            yield embeddings
+    
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts, returning all normalized embeddings in input order."""
+        if not texts:
+            return np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32)
+        return np.vstack(list(self.iter_embeddings(texts)))
+
+
+def use_embedding_pool(num_texts: int) -> bool:
+    """Whether a bulk job of this size should use the multi-process pool."""
+    return EMBED_POOL_WORKERS > 1 and num_texts >= EMBED_POOL_MIN_TEXTS
@@ -0,0 +1,178 @@
+"""
+In-process micro-batching of model calls.
+
+Concurrent requests each encode a handful of texts (a query, a few answer
+sentences) or score a handful of cross-encoder pairs. Calls for the same
+model are queued, collected for up to INFERENCE_MAX_WAIT_MS or until
+INFERENCE_MAX_BATCH_SIZE items are waiting, run as one batched model call
+on a worker thread, and the results are fanned back out to the callers.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+import sys
+sys.path.append('..')
+from config import INFERENCE_BATCHING_ENABLED, INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_WAIT_MS
+from .model_registry import get_sentence_transformer, get_cross_encoder
+from .scheduler import get_model_scheduler
+
+
+class MicroBatcher:
+    """Collect single items from many threads and process them in batches."""
+    
+    def __init__(
+        self,
+        name: str,
+        run_batch: Callable[[List], List],
+        max_batch_size: int = INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms: float = INFERENCE_MAX_WAIT_MS
+    ):
+        """
+        Initialize batcher.
+        
+        Args:
+            name: Name used for the worker thread and stats
+            run_batch: Processes a list of items, returning one result per item
+            max_batch_size: Most items passed to one run_batch call
+            max_wait_ms: How long to wait for more items after the first arrives
+        """
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+    
+    def _ensure_started(self):
+        # Started lazily so a pre-fork master never owns the worker thread
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name=f"batcher-{self.name}", daemon=True)
+                    self._thread.start()
+    
+    def submit_many(self, items: List) -> List:
+        """
+        Process items as part of shared batches and wait for their results.
+        
+        Args:
+            items: Items to process
+        
+        Returns:
+            Results in the order of items
+        """
+        self._ensure_started()
+        futures = []
+        for item in items:
+            future = Future()
+            self._queue.put((item, future))
+            futures.append(future)
+        return [future.result() for future in futures]
+    
+    def _collect(self) -> List[Tuple[object, Future]]:
+        """Block for one item, then gather more until the batch fills or the window closes."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            try:
+                # Model calls made on behalf of queries take interactive priority
+                with get_model_scheduler().interactive():
+                    results = self.run_batch([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+    
+    def get_stats(self) -> Dict:
+        """Batch counts and mean batch size."""
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+            'queued': self._queue.qsize()
+        }
+
+
+_batchers: Dict[Tuple[str, str], MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def _get_batcher(kind: str, model_name: str, run_batch: Callable[[List], List]) -> MicroBatcher:
+    key = (kind, model_name)
+    if key not in _batchers:
+        with _batchers_lock:
+            if key not in _batchers:
+                _batchers[key] = MicroBatcher(f"{kind}:{model_name}", run_batch)
+    return _batchers[key]
+
+
+def encode(model_name: str, texts: List[str]) -> np.ndarray:
+    """
+    Encode texts with a SentenceTransformer, batched with concurrent callers.
+    
+    Args:
+        model_name: Name of the SentenceTransformers model
+        texts: Texts to encode
+    
+    Returns:
+        Unnormalized embeddings (len(texts) x dimension)
+    """
+    model = get_sentence_transformer(model_name)
+    if not INFERENCE_BATCHING_ENABLED or not texts:
+        with get_model_scheduler().interactive():
+            return model.encode(texts, convert_to_numpy=True)
+    
+    batcher = _get_batcher(
+        "encode", model_name,
+        lambda items: list(model.encode(items, batch_size=len(items), convert_to_numpy=True))
+    )
+    return np.stack(batcher.submit_many(texts))
+
+
+def predict(model_name: str, pairs: List[List[str]]) -> np.ndarray:
+    """
+    Score (query, passage) pairs with a CrossEncoder, batched with concurrent callers.
+    
+    Args:
+        model_name: Name of the cross-encoder model
+        pairs: [query, passage] pairs
+    
+    Returns:
+        One score per pair
+    """
+    model = get_cross_encoder(model_name)
+    if not INFERENCE_BATCHING_ENABLED or not pairs:
+        with get_model_scheduler().interactive():
+            return model.predict(pairs)
+    
+    batcher = _get_batcher(
+        "predict", model_name,
+        lambda items: list(model.predict(items, batch_size=len(items)))
+    )
+    return np.asarray(batcher.submit_many(pairs))
+
+
+def get_inference_stats() -> Dict[str, Dict]:
+    """Stats for every batcher created in this process."""
+    return {batcher.name: batcher.get_stats() for batcher in list(_batchers.values())}
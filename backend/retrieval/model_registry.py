@@ -0,0 +1,70 @@
+"""
+Process-wide registry of loaded models.
+
+Every component that needs a SentenceTransformer or CrossEncoder gets it
+from here, so a model name is loaded at most once per process no matter
+how many components use it.
+"""
+import threading
+from typing import Dict, Tuple
+import sys
+sys.path.append('..')
+from config import INFERENCE_BACKEND
+
+_models: Dict[Tuple[str, str], object] = {}
+_registry_lock = threading.Lock()
+
+
+def _get_or_load(kind: str, model_name: str, loader):
+    key = (kind, model_name)
+    model = _models.get(key)
+    if model is None:
+        with _registry_lock:
+            model = _models.get(key)
+            if model is None:
+                print(f"Loading {kind} model: {model_name}")
+                model = loader(model_name)
+                _models[key] = model
+    return model
+
+
+def get_sentence_transformer(model_name: str):
+    """
+    Get the shared SentenceTransformer for a model name, loading it on first use.
+    
+    Args:
+        model_name: Name of the SentenceTransformers model
+    
+    Returns:
+        SentenceTransformer instance
+    """
+    if INFERENCE_BACKEND == "onnx":
+        from .onnx_backend import OnnxSentenceEncoder
+        return _get_or_load("embedding", model_name, OnnxSentenceEncoder)
+    
+    # Imported here so importing the package does not pull in torch
+    from sentence_transformers import SentenceTransformer
+    return _get_or_load("embedding", model_name, SentenceTransformer)
+
+
+def get_cross_encoder(model_name: str):
+    """
+    Get the shared CrossEncoder for a model name, loading it on first use.
+    
+    Args:
+        model_name: Name of the cross-encoder model
+    
+    Returns:
+        CrossEncoder instance
+    """
+    if INFERENCE_BACKEND == "onnx":
+        from .onnx_backend import OnnxCrossEncoder
+        return _get_or_load("cross-encoder", model_name, OnnxCrossEncoder)
+    
+    from sentence_transformers import CrossEncoder
+    return _get_or_load("cross-encoder", model_name, CrossEncoder)
+
+
+def loaded_models() -> Dict[str, str]:
+    """Names of the models loaded in this process, by kind."""
+    return {f"{kind}:{name}": type(model).__name__ for (kind, name), model in _models.items()}
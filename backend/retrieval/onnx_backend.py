@@ -0,0 +1,219 @@
+"""
+ONNX Runtime backend for the embedding and cross-encoder models.
+
+Models are exported from their SentenceTransformers/CrossEncoder versions
+once (this needs torch), optionally quantized to int8 with dynamic
+quantization, and stored with their tokenizer under ONNX_MODEL_DIR. After
+that they load and run with onnxruntime and transformers' tokenizer only.
+
+The wrappers expose the subset of the SentenceTransformer and CrossEncoder
+interfaces the rest of the backend uses, so the model registry can hand
+them out in place of the torch models.
+"""
+import json
+from pathlib import Path
+from typing import Dict, List, Union
+import numpy as np
+import sys
+sys.path.append('..')
+from config import ONNX_MODEL_DIR, ONNX_QUANTIZE, ONNX_INTRA_OP_THREADS
+
+_INPUT_NAMES = ('input_ids', 'attention_mask', 'token_type_ids')
+
+# Intra-op threads of sessions created from now on in this process
+_intra_op_threads = ONNX_INTRA_OP_THREADS
+
+
+def set_intra_op_threads(threads: int):
+    """
+    Set the intra-op thread count of ONNX sessions loaded afterwards.
+    
+    Args:
+        threads: Threads per session (0 lets ONNX Runtime pick)
+    """
+    global _intra_op_threads
+    _intra_op_threads = threads
+
+
+def _model_dir(model_name: str) -> Path:
+    return Path(ONNX_MODEL_DIR) / model_name.replace('/', '__')
+
+
+def _export(module, tokenizer, model_dir: Path, output_name: str, sample_inputs: Dict, meta: Dict):
+    """Export a torch module to ONNX, quantize it, and save the tokenizer and metadata."""
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    
+    input_names = [name for name in _INPUT_NAMES if name in sample_inputs]
+    
+    class _Wrapper(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+        
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs)))[0]
+    
+    model_dir.mkdir(parents=True, exist_ok=True)
+    fp32_path = model_dir / "model.onnx"
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes[output_name] = {0: 'batch', 1: 'sequence'} if output_name == 'last_hidden_state' else {0: 'batch'}
+    
+    module.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            _Wrapper(module),
+            tuple(sample_inputs[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=[output_name],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+    quantize_dynamic(str(fp32_path), str(model_dir / "model.int8.onnx"), weight_type=QuantType.QInt8)
+    
+    tokenizer.save_pretrained(str(model_dir))
+    with open(model_dir / "meta.json", 'w') as f:
+        json.dump(meta, f, indent=2)
+    print(f"Exported ONNX model to {model_dir}")
+
+
+def export_sentence_transformer(model_name: str) -> Path:
+    """Export a SentenceTransformers model (transformer + pooling) to ONNX."""
+    from sentence_transformers import SentenceTransformer
+    
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer, pooling = model[0], model[1]
+    meta = {
+        'model_name': model_name,
+        'max_length': model.max_seq_length,
+        'pooling': 'cls' if getattr(pooling, 'pooling_mode_cls_token', False) else 'mean',
+        'normalize': any(type(module).__name__ == 'Normalize' for module in model),
+        'dimension': model.get_sentence_embedding_dimension()
+    }
+    sample = transformer.tokenizer(["ONNX export sample"], return_tensors='pt')
+    model_dir = _model_dir(model_name)
+    _export(transformer.auto_model, transformer.tokenizer, model_dir, 'last_hidden_state', sample, meta)
+    return model_dir
+
+
+def export_cross_encoder(model_name: str) -> Path:
+    """Export a CrossEncoder model to ONNX."""
+    from sentence_transformers import CrossEncoder
+    
+    model = CrossEncoder(model_name, device='cpu')
+    meta = {
+        'model_name': model_name,
+        'max_length': model.max_length,
+        'num_labels': model.config.num_labels,
+        'activation': 'sigmoid' if type(model.default_activation_function).__name__ == 'Sigmoid' else 'identity'
+    }
+    sample = model.tokenizer(["query"], ["passage"], return_tensors='pt')
+    model_dir = _model_dir(model_name)
+    _export(model.model, model.tokenizer, model_dir, 'logits', sample, meta)
+    return model_dir
+
+
+class _OnnxModel:
+    """ONNX Runtime session plus tokenizer for an exported model."""
+    
+    def __init__(self, model_name: str, exporter, quantize: bool = ONNX_QUANTIZE):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        
+        model_dir = _model_dir(model_name)
+        if not (model_dir / "meta.json").exists():
+            print(f"No ONNX export of {model_name} found, exporting...")
+            exporter(model_name)
+        
+        with open(model_dir / "meta.json") as f:
+            self.meta = json.load(f)
+        
+        options = ort.SessionOptions()
+        if _intra_op_threads:
+            options.intra_op_num_threads = _intra_op_threads
+        model_path = model_dir / ("model.int8.onnx" if quantize else "model.onnx")
+        self.session = ort.InferenceSession(str(model_path), options, providers=['CPUExecutionProvider'])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        print(f"Loaded ONNX model {model_path}")
+    
+    def _run(self, *texts) -> tuple:
+        encoded = self.tokenizer(
+            *texts, padding=True, truncation=True, max_length=self.meta['max_length'], return_tensors='np'
+        )
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        return self.session.run(None, feeds)[0], encoded['attention_mask']
+
+
+class OnnxSentenceEncoder(_OnnxModel):
+    """Drop-in replacement for SentenceTransformer.encode backed by ONNX Runtime."""
+    
+    def __init__(self, model_name: str, quantize: bool = ONNX_QUANTIZE):
+        super().__init__(model_name, export_sentence_transformer, quantize)
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.meta['dimension']
+    
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        Encode sentences.
+        
+        Args:
+            sentences: A sentence or list of sentences
+            batch_size: Sentences per session run
+        
+        Returns:
+            Embeddings (1-D for a single sentence)
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.meta['dimension']), dtype=np.float32)
+        
+        parts = []
+        for start in range(0, len(texts), batch_size):
+            hidden, mask = self._run(texts[start:start + batch_size])
+            if self.meta['pooling'] == 'cls':
+                pooled = hidden[:, 0]
+            else:
+                mask = mask[..., None].astype(np.float32)
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            parts.append(pooled)
+        
+        embeddings = np.vstack(parts).astype(np.float32)
+        if self.meta['normalize']:
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings[0] if single else embeddings
+
+
+class OnnxCrossEncoder(_OnnxModel):
+    """Drop-in replacement for CrossEncoder.predict backed by ONNX Runtime."""
+    
+    def __init__(self, model_name: str, quantize: bool = ONNX_QUANTIZE):
+        super().__init__(model_name, export_cross_encoder, quantize)
+    
+    def predict(self, sentences: List[List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        Score (query, passage) pairs.
+        
+        Args:
+            sentences: [query, passage] pairs
+            batch_size: Pairs per session run
+        
+        Returns:
+            One score per pair (one row of label scores if the model has several labels)
+        """
+        if not sentences:
+            return np.zeros((0,), dtype=np.float32)
+        
+        parts = []
+        for start in range(0, len(sentences), batch_size):
+            batch = sentences[start:start + batch_size]
+            logits, _ = self._run([pair[0] for pair in batch], [pair[1] for pair in batch])
+            parts.append(logits)
+        
+        scores = np.vstack(parts).astype(np.float32)
+        if self.meta['activation'] == 'sigmoid':
+            scores = 1.0 / (1.0 + np.exp(-scores))
+        return scores[:, 0] if self.meta['num_labels'] == 1 else scores
@@ -1,30 +1,131 @@
 """
 Optional cross-encoder reranking for improved precision.
 """
-from sentence_transformers import CrossEncoder
-from typing import List, Tuple
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
 import sys
-from config import RERANK_ENABLED
+from config import RERANK_ENABLED, RERANK_MODEL, RERANK_SKIP_MARGIN, RERANK_PREFIX_SIZE, RERANK_CACHE_SIZE
+from .model_registry import get_cross_encoder
+from . import inference
 
 sys.path.append('..')
 
 class Reranker:
     """Rerank retrieved chunks using cross-encoder."""
     
-    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+    def __init__(self, model_name: str = RERANK_MODEL):
         """
         Initialize reranker.
         
         Args:
             model_name: Name of the cross-encoder model
         """
+        self.model_name = model_name
         if RERANK_ENABLED:
-            print(f"Loading reranker model: {model_name}")
-            self.model = CrossEncoder(model_name)
+            self.model = get_cross_encoder(model_name)
             self.enabled = True
         else:
             self.model = None
             self.enabled = False
+        
+        self.skip_margin = RERANK_SKIP_MARGIN
+        self.prefix_size = RERANK_PREFIX_SIZE
+        self.cache_size = RERANK_CACHE_SIZE
+        self._cache = OrderedDict()  # (query hash, chunk_id) -> score, in LRU order
+        self._cache_lock = threading.Lock()
+        self.stats = {'requests': 0, 'skipped': 0, 'pairs_scored': 0, 'cache_hits': 0}
+    
+    @staticmethod
+    def _query_key(query: str) -> str:
+        """Hash of the query with case, whitespace and trailing punctuation normalized."""
+        normalized = re.sub(r'\s+', ' ', query.strip().lower()).rstrip('?!. ')
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+    
+    def _cached_scores(self, query_key: str, chunk_ids: List[str]) -> Dict[str, float]:
+        """Cached cross-encoder scores for a query, keyed by chunk_id."""
+        scores = {}
+        with self._cache_lock:
+            for chunk_id in chunk_ids:
+                key = (query_key, chunk_id)
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[chunk_id] = self._cache[key]
+        self.stats['cache_hits'] += len(scores)
+        return scores
+    
+    def _predict(self, query: str, query_key: str, candidates: List[Tuple[str, str]]) -> Dict[str, float]:
+        """Score (chunk_id, text) candidates with the cross-encoder and cache the scores."""
+        if not candidates:
+            return {}
+        predicted = inference.predict(self.model_name, [[query, text] for _, text in candidates])
+        scores = {chunk_id: float(score) for (chunk_id, _), score in zip(candidates, predicted)}
+        with self._cache_lock:
+            for chunk_id, score in scores.items():
+                self._cache[(query_key, chunk_id)] = score
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        self.stats['pairs_scored'] += len(candidates)
+        return scores
+    
+    def rerank_results(
+        self,
+        query: str,
+        results: List[Tuple[str, float]],
+        top_k: int,
+        fetch_texts: Callable[[List[str]], Dict[str, str]]
+    ) -> List[Tuple[str, float]]:
+        """
+        Rerank dense search results with a cascade.
+        
+        The cross-encoder is skipped when the dense scores already separate
+        the top_k candidates from the rest by at least skip_margin. Otherwise
+        only the best prefix_size candidates are scored (cached scores are
+        reused) and the rest keep their dense order after them.
+        
+        Cross-encoder scores only decide the order. Every path returns the
+        dense cosine scores, so similarity scores and the confidence derived
+        from them stay on one scale whether or not the cross-encoder ran.
+        
+        Args:
+            query: Query text
+            results: (chunk_id, dense score) pairs, best first
+            top_k: Number of results that will be used
+            fetch_texts: Returns texts keyed by chunk_id for the given IDs
+            
+        Returns:
+            (chunk_id, dense score) pairs in reranked order
+        """
+        if not self.enabled or not results:
+            return results
+        
+        self.stats['requests'] += 1
+        if len(results) > top_k and results[top_k - 1][1] - results[top_k][1] >= self.skip_margin:
+            self.stats['skipped'] += 1
+            return results
+        
+        prefix = results[:max(self.prefix_size, top_k)]
+        tail = results[len(prefix):]
+        
+        # Only texts of candidates without a cached score are needed; chunks
+        # whose text cannot be found are dropped
+        query_key = self._query_key(query)
+        scores = self._cached_scores(query_key, [chunk_id for chunk_id, _ in prefix])
+        uncached = [chunk_id for chunk_id, _ in prefix if chunk_id not in scores]
+        if uncached:
+            texts = fetch_texts(uncached)
+            scores.update(self._predict(
+                query, query_key, [(chunk_id, texts[chunk_id]) for chunk_id in uncached if chunk_id in texts]
+            ))
+        
+        reranked = sorted(
+            ((chunk_id, dense_score) for chunk_id, dense_score in prefix if chunk_id in scores),
+            key=lambda x: scores[x[0]],
+            reverse=True
+        )
+        return reranked + tail
     
     def rerank(
         self,
@@ -44,16 +145,17 @@ class Reranker:
         if not self.enabled or not chunks:
             return chunks
         
-        # Prepare pairs for cross-encoder
-        pairs = [[query, text] for _, text, _ in chunks]
-        
-        # Get reranking scores
-        scores = self.model.predict(pairs)
+        # Get reranking scores (cached scores are reused)
+        query_key = self._query_key(query)
+        scores = self._cached_scores(query_key, [chunk_id for chunk_id, _, _ in chunks])
+        scores.update(self._predict(
+            query, query_key, [(chunk_id, text) for chunk_id, text, _ in chunks if chunk_id not in scores]
+        ))
         
         # Combine with original data and sort
         reranked = [
-            (chunk_id, text, float(score))
-            for (chunk_id, text, _), score in zip(chunks, scores)
+            (chunk_id, text, scores[chunk_id])
+            for chunk_id, text, _ in chunks
         ]
         reranked.sort(key=lambda x: x[2], reverse=True)
         
@@ -0,0 +1,149 @@
+"""
+Priority scheduling of model execution between interactive and bulk work.
+
+Interactive work (query embedding, reranking and verification for /ask)
+and bulk work (embedding during ingestion and reindexing) share the same
+models and cores. Bulk work runs in bounded slices: a slice normally only
+starts when no interactive call is running or waiting, so a query waits
+for at most one slice. While interactive traffic is active, bulk work also
+sleeps between slices so it uses at most BULK_CPU_SHARE of the time. Under
+sustained interactive traffic bulk work is owed that share: once it has
+been off the cores long enough, its next slice is due and new interactive
+calls wait for it, so ingestion slows down but never starves.
+"""
+import threading
+import time
+from contextlib import contextmanager
+import sys
+sys.path.append('..')
+from config import BULK_CPU_SHARE, BULK_SLICE_TOKENS, BULK_THROTTLE_IDLE_SECONDS
+
+
+class ModelScheduler:
+    """Gate model calls so interactive work preempts bulk work between slices."""
+    
+    def __init__(
+        self,
+        bulk_cpu_share: float = BULK_CPU_SHARE,
+        bulk_slice_tokens: int = BULK_SLICE_TOKENS,
+        throttle_idle_seconds: float = BULK_THROTTLE_IDLE_SECONDS
+    ):
+        """
+        Initialize scheduler.
+        
+        Args:
+            bulk_cpu_share: Fraction of time bulk work may run while interactive traffic is active
+            bulk_slice_tokens: Padded tokens embedded per bulk slice
+            throttle_idle_seconds: Bulk work runs unthrottled once no interactive
+                call has been seen for this long
+        """
+        self.bulk_cpu_share = min(max(bulk_cpu_share, 0.01), 1.0)
+        self.bulk_slice_tokens = bulk_slice_tokens
+        self.throttle_idle_seconds = throttle_idle_seconds
+        self._cond = threading.Condition()
+        self._interactive_waiting = 0
+        self._interactive_running = 0
+        self._bulk_running = False
+        self._bulk_due = False
+        self._last_interactive = float('-inf')
+        self._last_bulk_end = float('-inf')
+        self._last_slice_seconds = 0.0
+        self.stats = {
+            'interactive_calls': 0, 'bulk_slices': 0, 'bulk_due_slices': 0,
+            'bulk_wait_seconds': 0.0, 'bulk_throttle_seconds': 0.0
+        }
+    
+    def _bulk_owed_in(self) -> float:
+        """Seconds until bulk work has been off the cores long enough for its next slice (caller holds the lock)."""
+        off_seconds = self._last_slice_seconds * (1.0 - self.bulk_cpu_share) / self.bulk_cpu_share
+        return off_seconds - (time.monotonic() - self._last_bulk_end)
+    
+    @contextmanager
+    def interactive(self):
+        """Run an interactive model call, waiting at most for the current or due bulk slice."""
+        with self._cond:
+            self._interactive_waiting += 1
+            while self._bulk_running or self._bulk_due:
+                self._cond.wait()
+            self._interactive_waiting -= 1
+            self._interactive_running += 1
+            self._last_interactive = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._interactive_running -= 1
+                self._last_interactive = time.monotonic()
+                self.stats['interactive_calls'] += 1
+                self._cond.notify_all()
+    
+    @contextmanager
+    def bulk_slice(self):
+        """
+        Run one bounded slice of bulk work once no interactive work is pending.
+        
+        If interactive work keeps the cores busy past the time bulk work is
+        owed, the slice becomes due: interactive calls that have not started
+        yet wait for it, and it runs as soon as the running ones finish.
+        """
+        wait_start = time.monotonic()
+        with self._cond:
+            while True:
+                interactive_busy = self._interactive_waiting or self._interactive_running
+                if not self._bulk_running and not self._interactive_running and (self._bulk_due or not interactive_busy):
+                    break
+                timeout = None
+                if interactive_busy and not self._bulk_running and not self._bulk_due:
+                    owed_in = self._bulk_owed_in()
+                    if owed_in <= 0:
+                        self._bulk_due = True
+                        self.stats['bulk_due_slices'] += 1
+                        continue
+                    timeout = owed_in
+                self._cond.wait(timeout)
+            self._bulk_due = False
+            self._bulk_running = True
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self._cond:
+                self._bulk_running = False
+                self._last_bulk_end = time.monotonic()
+                self._last_slice_seconds = elapsed
+                self.stats['bulk_slices'] += 1
+                self.stats['bulk_wait_seconds'] += started - wait_start
+                self._cond.notify_all()
+                throttle = time.monotonic() - self._last_interactive < self.throttle_idle_seconds
+            
+            # Yield the cores to interactive traffic for the rest of the period
+            if throttle and self.bulk_cpu_share < 1.0:
+                pause = elapsed * (1.0 - self.bulk_cpu_share) / self.bulk_cpu_share
+                self.stats['bulk_throttle_seconds'] += pause
+                time.sleep(pause)
+    
+    def get_stats(self) -> dict:
+        """Scheduler counters."""
+        with self._cond:
+            return {
+                **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.stats.items()},
+                'interactive_running': self._interactive_running,
+                'interactive_waiting': self._interactive_waiting,
+                'bulk_running': self._bulk_running,
+                'bulk_due': self._bulk_due
+            }
+
+
+_scheduler_instance = None
+_scheduler_lock = threading.Lock()
+
+
+def get_model_scheduler() -> ModelScheduler:
+    """Get or create the global model scheduler instance."""
+    global _scheduler_instance
+    if _scheduler_instance is None:
+        with _scheduler_lock:
+            if _scheduler_instance is None:
+                _scheduler_instance = ModelScheduler()
+    return _scheduler_instance
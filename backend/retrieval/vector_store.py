@@ -3,16 +3,204 @@ FAISS vector store for similarity search.
 """
 import faiss
 import numpy as np
+import hashlib
+import json
+import os
 import pickle
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional
 import sys
-from config import INDEX_DIR, EMBEDDING_DIMENSION
+from config import INDEX_DIR, EMBEDDING_DIMENSION, INDEX_SNAPSHOT_RETAIN, INDEX_SHARED_MODE, INDEX_WATCH_INTERVAL
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process index lock
+    fcntl = None
 
 sys.path.append('..')
 
+
+def _version_dir_name(version: int) -> str:
+    return f"v{version:06d}"
+
+
+def _list_versions(snapshots_dir: Path) -> List[int]:
+    """Snapshot versions present on disk, oldest first."""
+    versions = []
+    for path in snapshots_dir.glob("v*"):
+        if path.is_dir() and path.name[1:].isdigit():
+            versions.append(int(path.name[1:]))
+    return sorted(versions)
+
+
+def _read_current(snapshots_dir: Path) -> Optional[int]:
+    """Version the CURRENT pointer refers to, if any."""
+    try:
+        return int((snapshots_dir / "CURRENT").read_text().strip().lstrip("v"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_current(snapshots_dir: Path, version: int):
+    """Atomically point CURRENT at a snapshot version."""
+    tmp_path = snapshots_dir / f"CURRENT.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(_version_dir_name(version))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, snapshots_dir / "CURRENT")
+    _fsync_dir(snapshots_dir)
+
+
+def _fsync_file(path: Path):
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+
+
+def _fsync_dir(path: Path):
+    """Persist directory entries (renames); not supported on every platform."""
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_index(path: Path, mmap: bool):
+    """
+    Read a faiss index, memory-mapped when requested and supported.
+    
+    Returns:
+        Tuple of (index, whether it is memory-mapped)
+    """
+    mmap_flag = getattr(faiss, 'IO_FLAG_MMAP_IFC', None)
+    if mmap and mmap_flag is not None:
+        try:
+            return faiss.read_index(str(path), mmap_flag), True
+        except RuntimeError as e:
+            print(f"Could not memory-map {path}, loading into memory: {e}")
+    return faiss.read_index(str(path)), False
+
+
+def _validate_snapshot(snapshot_dir: Path, verify_checksums: bool = True) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Check a snapshot's files against its manifest.
+    
+    Args:
+        snapshot_dir: Snapshot version directory
+        verify_checksums: Hash the files; otherwise only compare their sizes
+            (manifests written before sizes were recorded are always hashed)
+    
+    Returns:
+        Tuple of (manifest or None, error message or None)
+    """
+    try:
+        with open(snapshot_dir / "manifest.json") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError) as e:
+        return None, f"unreadable manifest ({e})"
+    
+    for filename, prefix in (("faiss.index", 'index'), ("metadata.pkl", 'metadata')):
+        path = snapshot_dir / filename
+        if not path.exists():
+            return manifest, f"missing {filename}"
+        expected_bytes = manifest.get(f'{prefix}_bytes')
+        if not verify_checksums and expected_bytes is not None:
+            if path.stat().st_size != expected_bytes:
+                return manifest, f"size mismatch for {filename}"
+            continue
+        if _sha256(path) != manifest.get(f'{prefix}_sha256'):
+            return manifest, f"checksum mismatch for {filename}"
+    
+    return manifest, None
+
+
+class _ReadWriteLock:
+    """
+    Any number of readers or one writer.
+    
+    A waiting writer goes before new readers, and readers that were waiting
+    when a writer finishes go before the next writer, so neither side starves.
+    """
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._readers_waiting = 0
+        self._readers_turn = False
+        self._writing = False
+        self._writers_waiting = 0
+    
+    @contextmanager
+    def read(self):
+        """Hold the lock shared (not re-entrant)."""
+        with self._cond:
+            self._readers_waiting += 1
+            try:
+                while self._writing or (self._writers_waiting and not self._readers_turn):
+                    self._cond.wait()
+            finally:
+                self._readers_waiting -= 1
+                if not self._readers_waiting:
+                    self._readers_turn = False
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+    
+    @contextmanager
+    def write(self):
+        """Hold the lock exclusively (not re-entrant)."""
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writing or self._readers or self._readers_turn:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._readers_turn = self._readers_waiting > 0
+                self._cond.notify_all()
+
+
 class VectorStore:
-    """FAISS-based vector store for semantic search."""
+    """
+    FAISS-based vector store for semantic search.
+    
+    FAISS indexes must not be searched while they are modified, and the
+    chunk ID list has to change together with the index. Searches and
+    vector reads therefore share a reader/writer lock that every change to
+    the index takes exclusively. Writers still serialize among themselves
+    with index_write_lock.
+    """
     
     def __init__(self, dimension: int = EMBEDDING_DIMENSION):
         """
@@ -24,6 +212,12 @@ class VectorStore:
         self.dimension = dimension
         self.index = faiss.IndexFlatIP(dimension)
         self.chunk_ids = []  
+        self._positions = None  # chunk_id -> index position, built on first lookup
+        self.snapshot_version = None
+        self.manifest = None
+        self.read_only = False  # index is memory-mapped from a shared snapshot
+        self.dirty = False  # modified since last load/save
+        self._rw_lock = _ReadWriteLock()
         self.index_dir = Path(INDEX_DIR)
         self.index_dir.mkdir(exist_ok=True)
     
@@ -40,10 +234,93 @@ class VectorStore:
         
         embeddings = embeddings.astype('float32')
         
-        self.index.add(embeddings)
-        self.chunk_ids.extend(chunk_ids)
+        with self._rw_lock.write():
+            self._ensure_writable()
+            self.index.add(embeddings)
+            self.chunk_ids.extend(chunk_ids)
+            self._positions = None
+            self.dirty = True
+            total = self.index.ntotal
         
-        print(f"Added {len(chunk_ids)} embeddings to index. Total: {self.index.ntotal}")
+        print(f"Added {len(chunk_ids)} embeddings to index. Total: {total}")
+    
+    def remove_chunk_ids(self, chunk_ids: List[str]) -> int:
+        """
+        Remove the vectors belonging to the given chunk IDs.
+        
+        IndexFlatIP compacts the remaining vectors in order, so the chunk ID
+        list is filtered the same way to keep positions aligned. Both change
+        under the exclusive lock, so no search sees one without the other.
+        
+        Args:
+            chunk_ids: Chunk IDs whose vectors should be removed
+            
+        Returns:
+            Number of vectors removed
+        """
+        to_remove = set(chunk_ids)
+        with self._rw_lock.write():
+            positions = np.array(
+                [i for i, chunk_id in enumerate(self.chunk_ids) if chunk_id in to_remove],
+                dtype='int64'
+            )
+            if len(positions) == 0:
+                return 0
+            
+            self._ensure_writable()
+            self.index.remove_ids(positions)
+            self.chunk_ids = [chunk_id for chunk_id in self.chunk_ids if chunk_id not in to_remove]
+            self._positions = None
+            self.dirty = True
+            total = self.index.ntotal
+        
+        print(f"Removed {len(positions)} embeddings from index. Total: {total}")
+        return len(positions)
+    
+    def copy(self) -> 'VectorStore':
+        """
+        Private, writable copy of this store, to be modified and swapped in.
+        
+        Returns:
+            New store with a copy of the index and chunk IDs
+        """
+        clone = VectorStore(self.dimension)
+        with self._rw_lock.read():
+            clone.index = faiss.clone_index(self.index)
+            clone.chunk_ids = list(self.chunk_ids)
+            clone.snapshot_version = self.snapshot_version
+            clone.manifest = self.manifest
+        return clone
+    
+    def _ensure_writable(self):
+        """Copy a memory-mapped index into private memory before modifying it."""
+        if self.read_only:
+            self.index = faiss.clone_index(self.index)
+            self.read_only = False
+    
+    def get_vectors(self, chunk_ids: List[str]) -> Tuple[List[str], np.ndarray]:
+        """
+        Read stored vectors back out of the index.
+        
+        Positions are looked up and the vectors read under one shared lock,
+        so a concurrent add or remove cannot shift them in between.
+        
+        Args:
+            chunk_ids: Chunk IDs to look up
+            
+        Returns:
+            Tuple of (chunk IDs found, their vectors as an N x dimension array)
+        """
+        with self._rw_lock.read():
+            if self._positions is None:
+                self._positions = {chunk_id: i for i, chunk_id in enumerate(self.chunk_ids)}
+            positions = self._positions
+            found = [chunk_id for chunk_id in chunk_ids if chunk_id in positions]
+            if not found:
+                return [], np.zeros((0, self.dimension), dtype='float32')
+            
+            keys = np.array([positions[chunk_id] for chunk_id in found], dtype='int64')
+            return found, self.index.reconstruct_batch(keys)
     
     def search(self, query_embedding: np.ndarray, top_k: int = 12) -> List[Tuple[str, float]]:
         """
@@ -56,56 +333,204 @@ class VectorStore:
         Returns:
             List of (chunk_id, similarity_score) tuples
         """
-        if len(self.chunk_ids) == 0:
-            return []
-        
         if query_embedding.ndim == 1:
             query_embedding = query_embedding.reshape(1, -1)
         query_embedding = query_embedding.astype('float32')
         
-        k = min(top_k, self.index.ntotal)
-        distances, indices = self.index.search(query_embedding, k)
-        
-        results = []
-        for dist, idx in zip(distances[0], indices[0]):
-            if idx < len(self.chunk_ids): 
-                chunk_id = self.chunk_ids[idx]
-                similarity = float(dist) 
-                results.append((chunk_id, similarity))
+        # Positions are only meaningful against the chunk IDs of the same index state
+        with self._rw_lock.read():
+            if len(self.chunk_ids) == 0:
+                return []
+            k = min(top_k, self.index.ntotal)
+            distances, indices = self.index.search(query_embedding, k)
+            
+            results = []
+            for dist, idx in zip(distances[0], indices[0]):
+                if 0 <= idx < len(self.chunk_ids):
+                    chunk_id = self.chunk_ids[idx]
+                    similarity = float(dist)
+                    results.append((chunk_id, similarity))
         
         return results
     
-    def save(self, name: str = "faiss"):
+    def _snapshots_dir(self, name: str) -> Path:
+        return self.index_dir / f"{name}_snapshots"
+    
+    def save(self, name: str = "faiss", db_high_water_mark: Optional[int] = None) -> int:
         """
-        Save index and metadata to disk.
+        Save index and metadata to disk as a new versioned snapshot.
+        
+        The snapshot is written to a temporary directory and fsync'd, renamed
+        to its version directory, and only then made live by atomically
+        replacing the CURRENT pointer. A crash at any point leaves the
+        previous snapshot live and intact.
         
         Args:
             name: Name prefix for saved files
+            db_high_water_mark: Highest chunk rowid in the database covered by
+                this snapshot, recorded in the manifest
+            
+        Returns:
+            Version number of the new snapshot
         """
-        index_path = self.index_dir / f"{name}.index"
-        metadata_path = self.index_dir / f"{name}_metadata.pkl"
+        snapshots_dir = self._snapshots_dir(name)
+        snapshots_dir.mkdir(parents=True, exist_ok=True)
+        
+        versions = _list_versions(snapshots_dir)
+        version = (versions[-1] if versions else 0) + 1
+        
+        tmp_dir = snapshots_dir / f".tmp-{uuid.uuid4().hex}"
+        tmp_dir.mkdir()
+        index_path = tmp_dir / "faiss.index"
+        metadata_path = tmp_dir / "metadata.pkl"
         
-        faiss.write_index(self.index, str(index_path))
+        with self._rw_lock.read():
+            faiss.write_index(self.index, str(index_path))
+            with open(metadata_path, 'wb') as f:
+                pickle.dump({'chunk_ids': self.chunk_ids, 'dimension': self.dimension}, f)
+            vector_count = int(self.index.ntotal)
+        _fsync_file(index_path)
+        _fsync_file(metadata_path)
         
-        metadata = {
-            'chunk_ids': self.chunk_ids,
-            'dimension': self.dimension
+        manifest = {
+            'version': version,
+            'created_at': datetime.utcnow().isoformat(),
+            'vector_count': vector_count,
+            'dimension': self.dimension,
+            'index_sha256': _sha256(index_path),
+            'metadata_sha256': _sha256(metadata_path),
+            'index_bytes': index_path.stat().st_size,
+            'metadata_bytes': metadata_path.stat().st_size,
+            'db_high_water_mark': db_high_water_mark
         }
-        with open(metadata_path, 'wb') as f:
-            pickle.dump(metadata, f)
+        manifest_path = tmp_dir / "manifest.json"
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        _fsync_file(manifest_path)
+        _fsync_dir(tmp_dir)
+        
+        os.rename(tmp_dir, snapshots_dir / _version_dir_name(version))
+        _fsync_dir(snapshots_dir)
+        
+        # Atomic pointer flip makes the snapshot live
+        _write_current(snapshots_dir, version)
+        self.snapshot_version = version
+        self.manifest = manifest
+        self.dirty = False
+        
+        self._prune_snapshots(snapshots_dir, version)
+        
+        print(f"Saved index snapshot v{version} ({manifest['vector_count']} vectors)")
+        return version
+    
+    def _prune_snapshots(self, snapshots_dir: Path, live_version: int):
+        """Remove old snapshots beyond the retention count, and stale temp dirs."""
+        versions = _list_versions(snapshots_dir)
+        keep = set(versions[-INDEX_SNAPSHOT_RETAIN:]) | {live_version}
+        for version in versions:
+            if version not in keep:
+                shutil.rmtree(snapshots_dir / _version_dir_name(version), ignore_errors=True)
+        for tmp_dir in snapshots_dir.glob(".tmp-*"):
+            if tmp_dir.is_dir():
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+    
+    def list_snapshots(self, name: str = "faiss") -> List[Dict]:
+        """
+        List retained snapshots with their manifests and validity.
+        
+        Returns:
+            Manifest dictionaries, newest first, with 'valid' and 'live' flags
+        """
+        snapshots_dir = self._snapshots_dir(name)
+        if not snapshots_dir.exists():
+            return []
         
-        print(f"Saved index to {index_path}")
+        live_version = _read_current(snapshots_dir)
+        snapshots = []
+        for version in reversed(_list_versions(snapshots_dir)):
+            manifest, error = _validate_snapshot(snapshots_dir / _version_dir_name(version))
+            entry = dict(manifest or {'version': version})
+            entry['valid'] = error is None
+            entry['live'] = version == live_version
+            if error:
+                entry['error'] = error
+            snapshots.append(entry)
+        return snapshots
     
-    def load(self, name: str = "faiss") -> bool:
+    def load(
+        self,
+        name: str = "faiss",
+        version: Optional[int] = None,
+        mmap: bool = False,
+        verify_checksums: bool = True
+    ) -> bool:
         """
         Load index and metadata from disk.
         
+        The live snapshot's manifest is validated (file checksums, vector
+        count, dimension). If it fails validation the newest older valid
+        snapshot is loaded instead. Indexes saved before snapshots existed
+        are still loaded from the legacy flat files.
+        
         Args:
             name: Name prefix for saved files
+            version: Load this snapshot version instead of the live one
+            mmap: Memory-map the index read-only so worker processes share
+                its pages (copied on first modification)
+            verify_checksums: Hash the snapshot files against the manifest;
+                otherwise only their sizes are checked (for reloading
+                snapshots that were just published and hashed by a writer)
             
         Returns:
             True if loaded successfully, False otherwise
         """
+        snapshots_dir = self._snapshots_dir(name)
+        if not snapshots_dir.exists():
+            return self._load_legacy(name)
+        
+        if version is not None:
+            candidates = [version]
+        else:
+            live_version = _read_current(snapshots_dir)
+            older = [v for v in reversed(_list_versions(snapshots_dir)) if live_version is None or v < live_version]
+            candidates = ([live_version] if live_version is not None else []) + older
+        
+        for candidate in candidates:
+            snapshot_dir = snapshots_dir / _version_dir_name(candidate)
+            manifest, error = _validate_snapshot(snapshot_dir, verify_checksums)
+            if error:
+                print(f"Skipping index snapshot v{candidate}: {error}")
+                continue
+            
+            index, mapped = _read_index(snapshot_dir / "faiss.index", mmap)
+            with open(snapshot_dir / "metadata.pkl", 'rb') as f:
+                metadata = pickle.load(f)
+            
+            if index.ntotal != manifest['vector_count'] or len(metadata['chunk_ids']) != manifest['vector_count']:
+                print(f"Skipping index snapshot v{candidate}: vector count does not match manifest")
+                continue
+            if index.d != manifest['dimension']:
+                print(f"Skipping index snapshot v{candidate}: dimension does not match manifest")
+                continue
+            
+            with self._rw_lock.write():
+                self.index = index
+                self.chunk_ids = metadata['chunk_ids']
+                self._positions = None
+                self.dimension = metadata['dimension']
+                self.snapshot_version = candidate
+                self.manifest = manifest
+                self.read_only = mapped
+                self.dirty = False
+            
+            print(f"Loaded index snapshot v{candidate}{' (memory-mapped)' if mapped else ''}. Total vectors: {self.index.ntotal}")
+            return True
+        
+        print("No valid index snapshot found")
+        return False
+    
+    def _load_legacy(self, name: str) -> bool:
+        """Load an index saved as flat files before versioned snapshots."""
         index_path = self.index_dir / f"{name}.index"
         metadata_path = self.index_dir / f"{name}_metadata.pkl"
         
@@ -119,15 +544,40 @@ class VectorStore:
             metadata = pickle.load(f)
         
         self.chunk_ids = metadata['chunk_ids']
+        self._positions = None
         self.dimension = metadata['dimension']
         
         print(f"Loaded index from {index_path}. Total vectors: {self.index.ntotal}")
         return True
     
+    def activate_snapshot(self, version: int, name: str = "faiss") -> bool:
+        """
+        Roll back (or forward) to a retained snapshot.
+        
+        Loads the snapshot into this store and, if it is valid, makes it the
+        live snapshot on disk.
+        
+        Args:
+            version: Snapshot version to activate
+            name: Name prefix for saved files
+            
+        Returns:
+            True if the snapshot was activated
+        """
+        if not self.load(name, version=version):
+            return False
+        _write_current(self._snapshots_dir(name), version)
+        print(f"Activated index snapshot v{version}")
+        return True
+    
     def clear(self):
         """Clear the index."""
-        self.index = faiss.IndexFlatIP(self.dimension)
-        self.chunk_ids = []
+        with self._rw_lock.write():
+            self.index = faiss.IndexFlatIP(self.dimension)
+            self.chunk_ids = []
+            self._positions = None
+            self.read_only = False
+            self.dirty = True
         print("Index cleared")
     
     def get_size(self) -> int:
@@ -137,11 +587,135 @@ class VectorStore:
 
 _vector_store_instance = None
 
+# Serializes writers of the active vector store (ingest, replace, reindex swap)
+_store_lock = threading.RLock()
+_lock_depth = 0
+_last_version_check = 0.0
 
-def get_vector_store() -> VectorStore:
-    """Get or create the global vector store instance."""
+
+@contextmanager
+def _interprocess_lock():
+    """Exclusive lock shared by all worker processes using the index directory."""
+    if fcntl is None:
+        yield
+        return
+    
+    with open(Path(INDEX_DIR) / "index.lock", 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _refresh_if_stale():
+    """
+    Swap in the live on-disk snapshot if another process published a new one.
+    
+    The publishing writer already hashed the snapshot, so only its version
+    and file sizes are checked here instead of re-hashing the whole index on
+    the request path.
+    
+    Caller must hold _store_lock.
+    """
     global _vector_store_instance
+    live_version = _read_current(Path(INDEX_DIR) / "faiss_snapshots")
+    if live_version is None:
+        return
+    if _vector_store_instance is not None and _vector_store_instance.snapshot_version == live_version:
+        return
+    
+    store = VectorStore()
+    if store.load(mmap=True, verify_checksums=False):
+        _vector_store_instance = store
+
+
+@contextmanager
+def index_write_lock():
+    """
+    Hold the index write lock.
+    
+    Writers take this around "commit chunks to the DB, add vectors to the
+    active store" so a reindex can catch up and swap without losing them.
+    
+    With INDEX_SHARED_MODE the lock is also held across worker processes
+    and the writer first picks up any snapshot another worker published.
+    Writers publish their changes once with VectorStore.save (one snapshot
+    per ingest, replace or reindex). Changes left unpublished when the lock
+    is released are replaced by the next snapshot another worker publishes,
+    so a writer spanning several lock holds (ingest) re-applies them.
+    
+    The lock blocks the calling thread, across processes in shared mode:
+    never take it on the event loop.
+    """
+    global _lock_depth
+    with _store_lock:
+        _lock_depth += 1
+        try:
+            if _lock_depth == 1 and INDEX_SHARED_MODE:
+                with _interprocess_lock():
+                    _refresh_if_stale()
+                    yield
+            else:
+                yield
+        finally:
+            _lock_depth -= 1
+
+
+def get_vector_store() -> VectorStore:
+    """
+    Get or create the global vector store instance.
+    
+    With INDEX_SHARED_MODE the store is memory-mapped from the live snapshot,
+    and the snapshot version file is checked every INDEX_WATCH_INTERVAL
+    seconds so snapshots published by other workers are picked up.
+    """
+    global _vector_store_instance, _last_version_check
     if _vector_store_instance is None:
-        _vector_store_instance = VectorStore()
-        _vector_store_instance.load()
+        with _store_lock:
+            if _vector_store_instance is None:
+                store = VectorStore()
+                store.load(mmap=INDEX_SHARED_MODE)
+                _vector_store_instance = store
+                _last_version_check = time.monotonic()
+    
+    if INDEX_SHARED_MODE and time.monotonic() - _last_version_check >= INDEX_WATCH_INTERVAL:
+        # Never block readers behind a writer; they will check again later
+        if _store_lock.acquire(blocking=False):
+            try:
+                _last_version_check = time.monotonic()
+                if _lock_depth == 0:
+                    _refresh_if_stale()
+            finally:
+                _store_lock.release()
+    
+    return _vector_store_instance
+
+
+def peek_vector_store() -> Optional[VectorStore]:
+    """
+    The active vector store if it is already loaded, without loading or refreshing it.
+    
+    Returns:
+        The active store, or None before it has been loaded
+    """
     return _vector_store_instance
+
+
+def swap_vector_store(new_store: VectorStore) -> Optional[VectorStore]:
+    """
+    Atomically make a new vector store the active one.
+    
+    Requests that already hold the old store keep using it until they finish.
+    
+    Args:
+        new_store: Fully built replacement store
+        
+    Returns:
+        The previously active store
+    """
+    global _vector_store_instance
+    with _store_lock:
+        old_store = _vector_store_instance
+        _vector_store_instance = new_store
+    return old_store
@@ -2,11 +2,18 @@
 Faithfulness verification - check if answer is supported by retrieved chunks.
 """
 import re
-from typing import List, Dict, Tuple
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Optional, Tuple
 import numpy as np
 import sys
-from config import EMBEDDING_MODEL
+from config import (
+    EMBEDDING_MODEL, VERIFICATION_LEXICAL_TIER, LEXICAL_NGRAM_SIZE,
+    LEXICAL_SUPPORT_THRESHOLD, LEXICAL_MIN_NGRAMS, EMBEDDING_SUPPORT_THRESHOLD
+)
+from retrieval import get_vector_store
+from retrieval import inference
+from retrieval.model_registry import get_sentence_transformer
+from .lexical import containment_matrix, ngram_counts
+from .sentence_index import split_sentences
 
 sys.path.append('..')
 
@@ -15,8 +22,12 @@ class FaithfulnessChecker:
     
     def __init__(self):
         """Initialize with embedding model for semantic similarity."""
-        self.model = SentenceTransformer(EMBEDDING_MODEL)
-        self.similarity_threshold = 0.5  # Threshold for considering a sentence supported
+        # Same model as the embedder; the registry shares one loaded copy
+        self.model = get_sentence_transformer(EMBEDDING_MODEL)
+        self.similarity_threshold = EMBEDDING_SUPPORT_THRESHOLD  # Threshold for considering a sentence supported
+        self.lexical_tier = VERIFICATION_LEXICAL_TIER
+        self.lexical_threshold = LEXICAL_SUPPORT_THRESHOLD
+        self.ngram_size = LEXICAL_NGRAM_SIZE
     
     def split_into_sentences(self, text: str) -> List[str]:
         """Split text into sentences."""
@@ -29,6 +40,133 @@ class FaithfulnessChecker:
         
         return sentences
     
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts in one batch and L2-normalize the rows."""
+        embeddings = inference.encode(EMBEDDING_MODEL, texts)
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    
+    def _context_vectors(self, context_chunks: List[Dict]) -> np.ndarray:
+        """
+        Get one normalized vector per context chunk.
+        
+        Chunk vectors are read back from the vector store, which already holds
+        the embeddings of the chunk texts; only chunks without a stored vector
+        (no chunk_id, or missing from the index) are encoded.
+        
+        Args:
+            context_chunks: List of context chunk dictionaries
+            
+        Returns:
+            Array of shape (len(context_chunks), dimension)
+        """
+        chunk_ids = [chunk.get('chunk_id') for chunk in context_chunks]
+        found_ids, found_vectors = get_vector_store().get_vectors([c for c in chunk_ids if c])
+        stored = dict(zip(found_ids, found_vectors))
+        
+        missing = [i for i, chunk_id in enumerate(chunk_ids) if chunk_id not in stored]
+        encoded = self._encode([context_chunks[i].get('text', '') for i in missing]) if missing else None
+        
+        vectors = np.empty((len(context_chunks), self.model.get_sentence_embedding_dimension()), dtype='float32')
+        for i, chunk_id in enumerate(chunk_ids):
+            if chunk_id in stored:
+                vectors[i] = stored[chunk_id]
+        if missing:
+            vectors[missing] = encoded
+        return vectors
+    
+    def _context_units(self, context_chunks: List[Dict]) -> Tuple[np.ndarray, List[Tuple[int, str]]]:
+        """
+        Get the vectors that answer sentences are compared against.
+        
+        Chunks carrying precomputed 'sentence_vectors' contribute one vector
+        per stored sentence; other chunks contribute their whole-chunk vector.
+        
+        Args:
+            context_chunks: List of context chunk dictionaries
+            
+        Returns:
+            Tuple of (vectors, owner of each vector as (chunk index, supporting text))
+        """
+        dimension = self.model.get_sentence_embedding_dimension()
+        blocks = []
+        owners = []
+        chunk_level = []
+        for i, chunk in enumerate(context_chunks):
+            vectors = chunk.get('sentence_vectors')
+            if vectors is not None and len(vectors) and vectors.shape[1] == dimension:
+                blocks.append(vectors)
+                owners.extend((i, sentence) for sentence in chunk['sentences'])
+            else:
+                chunk_level.append(i)
+        
+        if chunk_level:
+            blocks.append(self._context_vectors([context_chunks[i] for i in chunk_level]))
+            owners.extend((i, context_chunks[i].get('text', '')) for i in chunk_level)
+        
+        return np.vstack(blocks), owners
+    
+    def _lexical_tier(self, sentences: List[str], context_chunks: List[Dict]) -> Dict[int, Dict]:
+        """
+        Accept sentences that are near-verbatim copies of one context chunk.
+        
+        Args:
+            sentences: Answer sentences
+            context_chunks: List of context chunk dictionaries
+            
+        Returns:
+            Sentence details keyed by the index of each accepted sentence
+        """
+        scores = containment_matrix(sentences, [chunk.get('text', '') for chunk in context_chunks], self.ngram_size)
+        best_chunks = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(sentences)), best_chunks]
+        accepted = (best_scores >= self.lexical_threshold) & (ngram_counts(sentences, self.ngram_size) >= LEXICAL_MIN_NGRAMS)
+        
+        details = {}
+        for i in np.flatnonzero(accepted):
+            chunk = context_chunks[best_chunks[i]]
+            chunk_sentences = chunk.get('sentences') or split_sentences(chunk.get('text', ''))
+            sentence_scores = containment_matrix([sentences[i]], chunk_sentences, self.ngram_size)[0]
+            details[int(i)] = {
+                'sentence': sentences[i],
+                'supported': True,
+                'max_similarity': float(best_scores[i]),
+                'supporting_sentence': chunk_sentences[int(sentence_scores.argmax())] if chunk_sentences else None,
+                'supporting_chunk_id': chunk.get('chunk_id'),
+                'tier': 'lexical'
+            }
+        return details
+    
+    def _embedding_tier(self, sentences: List[str], context_chunks: List[Dict]) -> List[Dict]:
+        """Score sentences by embedding similarity against the context sentences."""
+        context_vectors, owners = self._context_units(context_chunks)
+        similarity_matrix = self._encode(sentences) @ context_vectors.T
+        best = similarity_matrix.argmax(axis=1)
+        
+        details = []
+        for row, (sentence, column) in enumerate(zip(sentences, best)):
+            similarity = float(similarity_matrix[row, column])
+            chunk_index, supporting_text = owners[column]
+            details.append({
+                'sentence': sentence,
+                'supported': similarity >= self.similarity_threshold,
+                'max_similarity': similarity,
+                'supporting_sentence': supporting_text,
+                'supporting_chunk_id': context_chunks[chunk_index].get('chunk_id'),
+                'tier': 'embedding'
+            })
+        return details
+    
+    def _unverified(self, sentence: str, tier: Optional[str] = 'unverified') -> Dict:
+        """Detail for a sentence no tier could support."""
+        return {
+            'sentence': sentence,
+            'supported': False,
+            'max_similarity': 0.0,
+            'supporting_sentence': None,
+            'supporting_chunk_id': None,
+            'tier': tier
+        }
+    
     def check_sentence_support(
         self,
         sentence: str,
@@ -47,39 +185,41 @@ class FaithfulnessChecker:
         if not context_chunks:
             return False, 0.0
         
-        # Embed sentence and contexts
-        sentence_emb = self.model.encode(sentence, convert_to_numpy=True)
-        context_embs = self.model.encode(context_chunks, convert_to_numpy=True)
-        
-        # Compute cosine similarities
-        sentence_emb = sentence_emb / np.linalg.norm(sentence_emb)
-        context_embs = context_embs / np.linalg.norm(context_embs, axis=1, keepdims=True)
-        
-        similarities = np.dot(context_embs, sentence_emb)
+        similarities = self._encode(context_chunks) @ self._encode([sentence])[0]
         max_similarity = float(np.max(similarities))
         
-        is_supported = max_similarity >= self.similarity_threshold
-        
-        return is_supported, max_similarity
+        return max_similarity >= self.similarity_threshold, max_similarity
     
     def verify_answer(
         self,
         answer: str,
-        context_chunks: List[Dict]
+        context_chunks: List[Dict],
+        embedding_tier: bool = True
     ) -> Dict:
         """
         Verify answer faithfulness.
         
+        Verification is a two-tier cascade. Sentences whose n-grams are mostly
+        contained in one context chunk are accepted by the lexical tier. The
+        remaining sentences are encoded in one batch and compared in a single
+        matrix multiply with the precomputed sentence vectors of the context
+        chunks, falling back to whole-chunk vectors for chunks without them.
+        Each sentence is reported with its best supporting context sentence
+        and the tier that decided it.
+        
+        With embedding_tier=False (no latency budget left for it) only the
+        lexical tier runs, and the remaining sentences are reported as
+        unsupported with tier 'unverified'.
+        
         Args:
             answer: Generated answer
-            context_chunks: List of context chunk dictionaries
+            context_chunks: List of context chunk dictionaries (with 'text' and,
+                when available, 'chunk_id', 'sentences' and 'sentence_vectors')
+            embedding_tier: Whether to escalate undecided sentences to the embedding tier
             
         Returns:
             Verification report dictionary
         """
-        # Extract just the text from chunks
-        context_texts = [chunk.get('text', '') for chunk in context_chunks]
-        
         # Split answer into sentences
         sentences = self.split_into_sentences(answer)
         
@@ -92,24 +232,22 @@ class FaithfulnessChecker:
                 'sentence_details': []
             }
         
-        # Check each sentence
-        sentence_details = []
-        supported_count = 0
+        if context_chunks:
+            decided = self._lexical_tier(sentences, context_chunks) if self.lexical_tier else {}
+            escalated = [i for i in range(len(sentences)) if i not in decided]
+            if escalated and not embedding_tier:
+                decided.update((i, self._unverified(sentences[i])) for i in escalated)
+            elif escalated:
+                embedding_details = self._embedding_tier([sentences[i] for i in escalated], context_chunks)
+                decided.update(zip(escalated, embedding_details))
+            sentence_details = [decided[i] for i in range(len(sentences))]
+        else:
+            sentence_details = [self._unverified(sentence, tier=None) for sentence in sentences]
         
-        for sentence in sentences:
-            is_supported, similarity = self.check_sentence_support(sentence, context_texts)
-            
-            sentence_details.append({
-                'sentence': sentence,
-                'supported': is_supported,
-                'max_similarity': similarity
-            })
-            
-            if is_supported:
-                supported_count += 1
+        supported_count = sum(1 for detail in sentence_details if detail['supported'])
         
         # Calculate faithfulness score
-        faithfulness_score = supported_count / len(sentences) if sentences else 1.0
+        faithfulness_score = supported_count / len(sentences)
         
         # Get unsupported sentences
         unsupported = [
@@ -0,0 +1,57 @@
+"""
+Lexical n-gram containment scoring for the first verification tier.
+
+The score of an answer sentence against a passage is the fraction of the
+sentence's word n-grams that also occur in the passage. Close paraphrases
+of the context score high and are accepted without running the model.
+"""
+import re
+from typing import List, Set
+import numpy as np
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def ngram_set(text: str, n: int) -> Set[str]:
+    """Lower-cased word n-grams of a text."""
+    tokens = _TOKEN.findall(text.lower())
+    return {' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)}
+
+
+def containment_matrix(sentences: List[str], passages: List[str], n: int) -> np.ndarray:
+    """
+    Score every sentence against every passage by n-gram containment.
+    
+    N-grams are mapped onto the vocabulary of the answer sentences, so the
+    whole sentence x passage matrix is one product of binary indicator
+    matrices.
+    
+    Args:
+        sentences: Answer sentences
+        passages: Context passages
+        n: N-gram size
+    
+    Returns:
+        Array of shape (len(sentences), len(passages)) with scores in [0, 1]
+    """
+    sentence_grams = [ngram_set(sentence, n) for sentence in sentences]
+    vocabulary = {gram: i for i, gram in enumerate(set().union(*sentence_grams))}
+    if not vocabulary or not passages:
+        return np.zeros((len(sentences), len(passages)), dtype=np.float32)
+    
+    sentence_matrix = np.zeros((len(sentences), len(vocabulary)), dtype=np.float32)
+    for row, grams in enumerate(sentence_grams):
+        sentence_matrix[row, [vocabulary[gram] for gram in grams]] = 1.0
+    
+    passage_matrix = np.zeros((len(passages), len(vocabulary)), dtype=np.float32)
+    for row, passage in enumerate(passages):
+        columns = [vocabulary[gram] for gram in ngram_set(passage, n) if gram in vocabulary]
+        passage_matrix[row, columns] = 1.0
+    
+    sizes = np.maximum(sentence_matrix.sum(axis=1, keepdims=True), 1.0)
+    return (sentence_matrix @ passage_matrix.T) / sizes
+
+
+def ngram_counts(sentences: List[str], n: int) -> np.ndarray:
+    """Number of distinct n-grams in each sentence."""
+    return np.array([len(ngram_set(sentence, n)) for sentence in sentences], dtype=np.int64)
@@ -40,25 +40,45 @@ class FaithfulnessScorer:
         score = verification_report.get('faithfulness_score', 0.0)
         unsupported = verification_report.get('unsupported_sentences', [])
         
-        if score >= self.threshold:
+        # Sentences left unchecked because the latency budget ran out are neither
+        # supported nor refuted: refusal is decided on the checked sentences
+        # alone, and the answer is reported as unverified rather than refused
+        unverified = [
+            detail for detail in verification_report.get('sentence_details', [])
+            if detail.get('tier') == 'unverified'
+        ]
+        checked = verification_report.get('total_sentences', 0) - len(unverified)
+        checked_score = score
+        if unverified:
+            checked_score = verification_report.get('supported_sentences', 0) / checked if checked else 1.0
+        
+        if checked_score < self.threshold * 0.7:
+            status = 'failed'
+            passed = False
+            message = f'Answer has low faithfulness score ({checked_score:.2f}). Many claims are not supported by the provided materials.'
+        elif unverified:
+            status = 'unverified'
+            passed = True
+            message = (
+                f'{len(unverified)} sentence(s) could not be verified within the latency budget '
+                f'(checked sentences score: {checked_score:.2f}).'
+            )
+        elif score >= self.threshold:
             status = 'passed'
             passed = True
             message = f'Answer is faithful to sources (score: {score:.2f})'
-        elif score >= self.threshold * 0.7:  # Warning zone
+        else:  # Warning zone
             status = 'warning'
             passed = True
             message = f'Answer partially supported (score: {score:.2f}). Some claims may not be fully verified.'
-        else:
-            status = 'failed'
-            passed = False
-            message = f'Answer has low faithfulness score ({score:.2f}). Many claims are not supported by the provided materials.'
         
         return {
             'status': status,
             'passed': passed,
             'message': message,
             'score': score,
-            'unsupported_count': len(unsupported)
+            'unsupported_count': len(unsupported),
+            'unverified_count': len(unverified)
         }
     
     def should_refuse(self, evaluation: Dict) -> bool:
@@ -0,0 +1,89 @@
+"""
+Per-chunk sentence embeddings used for fine-grained faithfulness checks.
+
+At ingestion each chunk is split into sentences and their embeddings are
+stored as one compact float16 array per chunk, so verification can compare
+answer sentences against individual context sentences without running the
+model on the context at query time.
+"""
+import re
+from typing import Dict, List, Tuple
+import numpy as np
+
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+def split_sentences(text: str, min_chars: int = 10) -> List[str]:
+    """
+    Split chunk text into sentences.
+    
+    Args:
+        text: Chunk text
+        min_chars: Shorter fragments are dropped
+    
+    Returns:
+        List of sentences; the whole stripped text if no sentence is long enough
+    """
+    sentences = [s.strip() for s in _SENTENCE_BOUNDARY.split(text)]
+    sentences = [s for s in sentences if len(s) > min_chars]
+    if not sentences and text.strip():
+        sentences = [text.strip()]
+    return sentences
+
+
+def build_sentence_rows(embedder, chunks: List[Tuple[str, str]]) -> List[Dict]:
+    """
+    Embed the sentences of many chunks in one batch.
+    
+    Args:
+        embedder: Embedder used for chunk embeddings
+        chunks: (chunk_id, text) pairs
+    
+    Returns:
+        Row dicts with chunk_id, sentences, embeddings (float16 bytes) and dimension
+    """
+    per_chunk = [(chunk_id, split_sentences(text)) for chunk_id, text in chunks]
+    all_sentences = [sentence for _, sentences in per_chunk for sentence in sentences]
+    if not all_sentences:
+        return []
+    
+    embeddings = embedder.embed_batch(all_sentences, show_progress=False).astype(np.float16)
+    
+    rows = []
+    offset = 0
+    for chunk_id, sentences in per_chunk:
+        if not sentences:
+            continue
+        vectors = embeddings[offset:offset + len(sentences)]
+        offset += len(sentences)
+        rows.append({
+            'chunk_id': chunk_id,
+            'sentences': sentences,
+            'embeddings': vectors.tobytes(),
+            'dimension': vectors.shape[1]
+        })
+    return rows
+
+
+def unpack_embeddings(embeddings: bytes, dimension: int) -> np.ndarray:
+    """Decode a stored sentence embedding array to float32 (sentences x dimension)."""
+    return np.frombuffer(embeddings, dtype=np.float16).reshape(-1, dimension).astype(np.float32)
+
+
+def attach_sentence_vectors(context_chunks: List[Dict], sentence_rows: Dict) -> List[Dict]:
+    """
+    Add stored sentences and their vectors to context chunk dictionaries.
+    
+    Args:
+        context_chunks: Context chunk dictionaries with 'chunk_id'
+        sentence_rows: Stored rows keyed by chunk_id
+    
+    Returns:
+        The same list, with 'sentences' and 'sentence_vectors' set where available
+    """
+    for chunk in context_chunks:
+        row = sentence_rows.get(chunk.get('chunk_id'))
+        if row is not None:
+            chunk['sentences'] = row.sentences
+            chunk['sentence_vectors'] = unpack_embeddings(row.embeddings, row.dimension)
+    return context_chunks